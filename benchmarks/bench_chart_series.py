@@ -0,0 +1,101 @@
+"""
+    df_to_series 的微基准测试：逐行 iterrows 的旧实现 vs 列式实现
+    用法（在项目根目录下执行）：
+        python -m benchmarks.bench_chart_series
+        python -m benchmarks.bench_chart_series --rows 10000 100000 --fields 30 --repeat 3
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from service.chart.series import df_to_series, format_timestamps
+
+
+def legacy_timestamp_to_datetime(timestamp):
+    # 旧实现：每次调用都重新构建时区对象
+    tz = pytz.timezone("Asia/Shanghai")
+    return datetime.fromtimestamp(timestamp, tz=tz).strftime("%Y-%m-%d %H:%M")
+
+
+def legacy_df_to_series(df) -> list:
+    # 旧实现：逐列、逐行遍历
+    res = []
+    for column in df.columns:
+        if column == "datetime" or column == "timestamp":
+            continue
+        series = {
+            "name": column,
+            "type": "line",
+            "smooth": True,
+            "data": []
+        }
+        for index, row in df.iterrows():
+            series["data"].append([legacy_timestamp_to_datetime(row["timestamp"]), row[column]])
+        res.append(series)
+    return res
+
+
+def build_frame(rows: int, fields: int, step: int = 1) -> pd.DataFrame:
+    """
+    构造和 pure_data 结构一致的合成数据：秒级 timestamp + 若干指标列
+    """
+    rng = np.random.default_rng(0)
+    start = 1680438689
+    data = {"timestamp": np.arange(start, start + rows * step, step, dtype="float64")}
+    for i in range(fields):
+        data[f"field_{i}"] = rng.random(rows)
+    return pd.DataFrame(data)
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+def check_equivalent(df: pd.DataFrame):
+    sample = df.head(500)
+    legacy = legacy_df_to_series(sample)
+    current = df_to_series(sample)
+    assert [s["name"] for s in legacy] == [s["name"] for s in current]
+    for old, new in zip(legacy, current):
+        assert [p[0] for p in old["data"]] == [p[0] for p in new["data"]]
+        assert np.allclose([p[1] for p in old["data"]], [p[1] for p in new["data"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark df_to_series")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--fields", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    # 旧实现在大数据量下非常慢，超过该行数时只跑一次
+    parser.add_argument("--legacy-max-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    check_equivalent(build_frame(1000, 3))
+
+    print(f"{'rows':>10} {'fields':>7} {'legacy(s)':>12} {'columnar(s)':>12} {'speedup':>9}")
+    for rows in args.rows:
+        df = build_frame(rows, args.fields)
+
+        def columnar():
+            frame = df.copy()
+            frame["datetime"] = format_timestamps(frame["timestamp"].to_numpy())
+            df_to_series(frame)
+
+        columnar_time = best_of(columnar, args.repeat)
+        legacy_repeat = args.repeat if rows <= args.legacy_max_rows else 1
+        legacy_time = best_of(lambda: legacy_df_to_series(df), legacy_repeat)
+        print(f"{rows:>10} {args.fields:>7} {legacy_time:>12.3f} {columnar_time:>12.3f} "
+              f"{legacy_time / columnar_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+    检查服务中每一种查询的执行计划，出现全表扫描（COLLSCAN）时以非 0 状态退出，可以放在 CI 或上线前执行
+    用法（在项目根目录下执行，需要能连上 mongodb）：
+        python -m benchmarks.check_query_plans
+        python -m benchmarks.check_query_plans --apply   # 先按 INDEX_MANIFEST 创建索引再检查
+"""
+import argparse
+import sys
+
+from config.config import mongo_client_chaos, mongo_client_platform_meta
+from service.chart.schedule import ensure_task_indexes
+from service.mongo import apply_index_manifest
+
+# 服务中的查询形状：(数据库, 集合, 查询条件, 排序)，只关心字段，值是任意的样例
+QUERY_SHAPES = [
+    ("chaos", "chaos", {"email": "check@example.com", "archived": False}, None),
+    ("chaos", "chaos", {"email": "check@example.com", "archived": True}, None),
+    ("chaos", "chaos", {"archived": True}, None),
+    ("chaos", "chaos", {"name": "check"}, None),
+    ("chaos", "chaos", {"namespace": "check"}, None),
+    ("chaos", "chaos", {"namespace": "check", "label": {"$in": ["check"]}, "start_time": {"$gte": 0, "$lte": 1}},
+     None),
+    ("chaos", "chaos", {"target": "check"}, None),
+    ("chaos", "schedule", {"email": "check@example.com", "archived": False}, None),
+    ("chaos", "schedule", {"archived": True}, None),
+    ("chaos", "schedule", {"name": "check"}, None),
+    ("chaos", "schedule", {"namespace": "check"}, None),
+    ("chaos", "vn_chaos", {"email": "check@example.com"}, None),
+    ("vn_chaos", "vn_chaos", {"namespace": "check"}, None),
+    ("aiops", "benchmark", {"email": "check@example.com", "name": "check"}, None),
+    ("aiops", "benchmark", {"visibility": "public"}, None),
+    ("aiops", "benchmark", {"email": "check@example.com", "visibility": "private"}, None),
+    ("aiops", "benchmark-files", {"email": "check@example.com", "benchmarkName": "check"}, None),
+    ("aiops", "benchmark-files", {"email": "check@example.com", "benchmarkName": "check", "dirPath": "check"}, None),
+    ("aiops", "benchmark-files", {"email": "check@example.com", "benchmarkName": "check", "dirPath": "check",
+                                  "fileName": "check"}, None),
+    ("aiops", "testbed", {"email": "check@example.com"}, None),
+    ("aiops", "testbed", {"email": "check@example.com", "namespace": "check"}, None),
+]
+
+
+def task_query_shapes() -> list:
+    """
+    每个推理任务的数据集合和预测结果集合上的时间范围查询
+    """
+    shapes = []
+    time_range = {"timestamp": {"$gte": 0, "$lte": 1}}
+    tasks = mongo_client_platform_meta.db["InferenceTask"].find({}, {"_id": 0, "name": 1, "dataSource.name": 1})
+    for task in tasks:
+        collection = task.get("dataSource", {}).get("name")
+        if collection:
+            shapes.append(("pure_data", collection, time_range, None))
+        if task.get("name"):
+            shapes.append(("evaluation", task["name"], time_range, None))
+            shapes.append(("evaluation", task["name"], {"timestamp": {"$lte": 1}}, [("timestamp", -1)]))
+    return shapes
+
+
+def plan_stages(plan: dict) -> list:
+    """
+    递归取出执行计划中的所有 stage
+    """
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def winning_stages(client, db: str, collection: str, query: dict, sort) -> list:
+    cursor = client[db][collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    return plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fail if any production query shape does a COLLSCAN")
+    parser.add_argument("--apply", action="store_true", help="apply INDEX_MANIFEST and task indexes first")
+    args = parser.parse_args()
+
+    client = mongo_client_chaos.client
+    if args.apply:
+        apply_index_manifest(client)
+        ensure_task_indexes()
+
+    failed = 0
+    for db, collection, query, sort in QUERY_SHAPES + task_query_shapes():
+        stages = winning_stages(client, db, collection, query, sort)
+        ok = "COLLSCAN" not in stages
+        failed += not ok
+        print("{:<5} {}.{} {} sort={} -> {}".format("ok" if ok else "FAIL", db, collection, sorted(query),
+                                                   sort, " <- ".join(s for s in stages if s)))
+
+    if failed:
+        print("{} query shape(s) do a COLLSCAN".format(failed))
+        sys.exit(1)
+    print("all query shapes use an index")
+
+
+if __name__ == '__main__':
+    main()
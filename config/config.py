@@ -2,16 +2,80 @@ import os.path
 
 from service import mongo
 
-mongo_client_eval = mongo.MongoConnectClient(host="k8s.personai.cn", db="evaluation", port=30332)
-
-# 历史记录存放
-mongo_client_vn_chaos = mongo.MongoConnectClient(host="k8s.personai.cn", db="vn_chaos", port=30332)
-
-mongo_client_chaos = mongo.MongoConnectClient(host="k8s.personai.cn", db="chaos", port=30332)
+# 所有数据库位于同一个 mongodb 上，共用一个连接池
+MONGO_HOST = "k8s.personai.cn"
+MONGO_PORT = 30332
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": 100,
+    "minPoolSize": 0,
+    "maxIdleTimeMS": 300000,
+    "serverSelectionTimeoutMS": 10000,
+    "connectTimeoutMS": 10000,
+}
 
-mongo_client_platform_meta = mongo.MongoConnectClient(host="k8s.personai.cn", db="aiops", port=30332)
+mongo_client_eval = mongo.MongoConnectClient(host=MONGO_HOST, db="evaluation", port=MONGO_PORT, **MONGO_POOL_OPTIONS)
 
-mongo_client_pure_data = mongo.MongoConnectClient(host="k8s.personai.cn", db="pure_data", port=30332)
+# 历史记录存放
+mongo_client_vn_chaos = mongo.MongoConnectClient(host=MONGO_HOST, db="vn_chaos", port=MONGO_PORT, **MONGO_POOL_OPTIONS)
+
+mongo_client_chaos = mongo.MongoConnectClient(host=MONGO_HOST, db="chaos", port=MONGO_PORT, **MONGO_POOL_OPTIONS)
+
+mongo_client_platform_meta = mongo.MongoConnectClient(host=MONGO_HOST, db="aiops", port=MONGO_PORT,
+                                                      **MONGO_POOL_OPTIONS)
+
+mongo_client_pure_data = mongo.MongoConnectClient(host=MONGO_HOST, db="pure_data", port=MONGO_PORT,
+                                                  **MONGO_POOL_OPTIONS)
+
+# 图表缓存：按 CHART_CACHE_BUCKET_SECONDS 秒对请求区间分桶，缓存 CHART_CACHE_TTL_SECONDS 秒
+CHART_CACHE_MAXSIZE = 256
+CHART_CACHE_TTL_SECONDS = 5
+CHART_CACHE_BUCKET_SECONDS = 5
+
+# 评估用的标注结果缓存：同一个 (task, target, start_time, end_time) 在 EVAL_CACHE_TTL_SECONDS 秒内只查询和标注一次
+EVAL_CACHE_MAXSIZE = 64
+EVAL_CACHE_TTL_SECONDS = 60
+# 评估时每批从游标读取的预测结果数，限制标注过程中的峰值内存
+EVAL_BATCH_SIZE = 10000
+
+# 链路探测的并发数：每个 namespace 同时进行的 ping 数量，未单独配置的 namespace 使用默认值
+LINK_PROBE_CONCURRENCY = 8
+LINK_PROBE_CONCURRENCY_BY_NAMESPACE = {}
+# 为 True 时每个源节点只 exec 一次，在 pod 内并发 ping 它的所有对端
+LINK_PROBE_BATCH = True
+# 链路指标写入的时序集合使用的后缀：文档格式为 {"timestamp", "meta": {"src", "dst", "uid"}, "latency_ms", "loss_rate_percent"}
+# 旧版本写入的 link_metrics（uid/src_pod/dst_pod）和 evaluation.<task>（source/target/loss_percent/link_id）是普通集合，
+# 新格式写入 link_metrics_ts 和 evaluation.<task>_ts，不与旧数据混在一起；旧数据需要时按上面的格式转换后导入新集合
+LINK_METRICS_TS_SUFFIX = "_ts"
+
+# 后台链路采样：每 LINK_SAMPLE_INTERVAL_SECONDS 秒探测一次每个虚拟网络，各 namespace 的执行时间随机错开最多 LINK_SAMPLE_JITTER_SECONDS 秒
+# 每 LINK_SAMPLE_DISCOVERY_SECONDS 秒重新扫描一次存在 Topology 的 namespace
+LINK_SAMPLE_INTERVAL_SECONDS = 300
+LINK_SAMPLE_JITTER_SECONDS = 60
+LINK_SAMPLE_DISCOVERY_SECONDS = 600
+LINK_SAMPLE_TASK = "network_metrics"
+
+# Chaos Mesh 对象列表的缓存时间，本服务自己的创建、删除、修改会立即使缓存失效
+CHAOS_LIST_CACHE_TTL_SECONDS = 10
+
+# Topology 缓存：每次 watch 请求的超时时间；超过 TOPOLOGY_CACHE_IDLE_SECONDS 秒没有读取的 namespace 停止 watch
+TOPOLOGY_WATCH_TIMEOUT_SECONDS = 300
+TOPOLOGY_CACHE_IDLE_SECONDS = 1800
+
+# 拓扑批量修改时并行创建 pod 和配置接口的线程数
+TOPOLOGY_BATCH_CONCURRENCY = 8
+
+# 等待 pod 就绪的超时时间；等待期间每次 pod watch 请求的超时时间
+POD_READY_TIMEOUT_SECONDS = 180
+POD_WATCH_TIMEOUT_SECONDS = 30
+
+# 拓扑操作中条件等待的超时时间：接口出现在 pod 的网络命名空间中、OVS 端口加入 br0、上一个操作的修改出现在 Topology 缓存中
+INTERFACE_WAIT_TIMEOUT_SECONDS = 30
+OVS_PORT_WAIT_TIMEOUT_SECONDS = 60
+TOPOLOGY_WAIT_TIMEOUT_SECONDS = 10
+
+# 历史记录分页：未指定 limit 时每页的记录数，以及 limit 的上限
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 500
 
 available_nodes = ["aiops-k8s1"]
 
@@ -5,9 +5,15 @@ from .testbed import testbed_bp
 from .benchmark import benchmark_bp
 from .virtualnetwork import virtualnetwork_bp
 from service.chaos import clear_stale_archives
+from service.chart.schedule import ensure_task_indexes
+from service.mongo import apply_index_manifest
+from config.config import mongo_client_chaos
+from service.link_sampler import register_link_sampler
 import time
 import atexit
 
+from loguru import logger
+
 from apscheduler.schedulers.background import BackgroundScheduler
 
 
@@ -19,8 +25,15 @@ def init_app(app):
     app.register_blueprint(benchmark_bp)
     app.register_blueprint(virtualnetwork_bp)
 
+    try:
+        apply_index_manifest(mongo_client_chaos.client)
+        ensure_task_indexes()
+    except Exception as e:
+        logger.warning("create indexes failed: {}".format(e))
+
     scheduler = BackgroundScheduler()
     scheduler.add_job(func=clear_stale_archives, trigger="interval", hours=1)
+    register_link_sampler(scheduler)
     scheduler.start()
 
     # Shut down the scheduler when exiting the app
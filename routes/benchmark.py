@@ -52,7 +52,8 @@ def benchmark_info_handler(email: str, benchmark_name: str):
         result = benchmark_exists(email, benchmark_name)
         return make_response(jsonify(exists=result), 200)
     else:
-        files = get_benchmark_files(email, benchmark_name)
+        # 文件列表默认不返回文件内容，content=true 时返回
+        files = get_benchmark_files(email, benchmark_name, with_content=request.args.get("content") == "true")
         return make_response(jsonify(files=files), 200)
 
 
@@ -88,7 +89,7 @@ def own_benchmark_handler(benchmark_name: str):
 @benchmark_bp.route('/<email>/<benchmark_name>/files')
 def download_benchmark_files(email: str, benchmark_name: str):
     # get files record
-    files = get_benchmark_files(email, benchmark_name)
+    files = get_benchmark_files(email, benchmark_name, with_content=True)
     # write files into a temp folder
     file_path_list = []
     if not os.path.exists(DOWNLOAD_TEMP_DIR):
@@ -123,7 +124,8 @@ def benchmark_dir_handler(email: str, benchmark_name: str, dir: str):
     if dir == "root":  # 根目录在mongo中的dir为空
         dir = ""
 
-    return make_response(jsonify(files=get_benchmark_files_under_dir(email, benchmark_name, dir)), 200)
+    files = get_benchmark_files_under_dir(email, benchmark_name, dir, with_content=request.args.get("content") == "true")
+    return make_response(jsonify(files=files), 200)
 
 
 @benchmark_bp.route('/<email>/<benchmark_name>/files/<file_name>')
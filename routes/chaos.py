@@ -1,10 +1,11 @@
 # 创建和管理故障注入实验
 from flask import Blueprint, make_response, jsonify, request
 
-from config.config import available_nodes, CHAOS_HISTORY_DIR
+from config.config import available_nodes, CHAOS_HISTORY_DIR, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
 from service.chaos import *
 from service.file import *
-from service.history import load_all_chaos, load_all_vn_chaos, archive_experiment_by_name, load_all_schedules, archive_schedule_by_name
+from service.history import load_all_chaos, load_all_vn_chaos, archive_experiment_by_name, load_all_schedules, archive_schedule_by_name, \
+    load_history_page
 from service.k8s import *
 from service.timeutil import get_timestamp, cal_end_timestamp
 
@@ -19,6 +20,59 @@ if not os.path.exists(CHAOS_HISTORY_DIR):
 history_list = []
 
 
+def parse_page_args(sort_fields=("_id", "start_time"), time_filter: bool = True):
+    """
+    解析历史记录列表的分页参数，请求中没有 limit 和 after 时不分页，返回全部记录
+    limit: 每页记录数；after: 上一页返回的 next；sort: 排序字段；order: asc / desc
+    kind、namespace、start_from、start_to: 可选的过滤条件，只在分页时生效，不分页时带过滤条件返回 400
+    :param time_filter: 记录中是否有 start_time 字段，没有时拒绝 start_from、start_to
+    :return: (分页参数, 错误响应)，不分页时分页参数为 None
+    """
+    args = request.args
+    if not time_filter and ("start_from" in args or "start_to" in args):
+        return None, make_response(jsonify(msg="start_from and start_to are not supported here"), 400)
+    if "limit" not in args and "after" not in args:
+        filters = [field for field in ("kind", "namespace", "start_from", "start_to") if field in args]
+        if filters:
+            return None, make_response(jsonify(msg="{} require limit or after".format(", ".join(filters))), 400)
+        return None, None
+    limit = args.get("limit", PAGE_DEFAULT_LIMIT, type=int)
+    if limit is None or limit <= 0 or limit > PAGE_MAX_LIMIT:
+        return None, make_response(jsonify(msg="limit must be between 1 and {}".format(PAGE_MAX_LIMIT)), 400)
+    sort = args.get("sort", "_id")
+    if sort not in sort_fields:
+        return None, make_response(jsonify(msg="sort must be one of {}".format(", ".join(sort_fields))), 400)
+    order = args.get("order", "desc")
+    if order not in ("asc", "desc"):
+        return None, make_response(jsonify(msg="order must be asc or desc"), 400)
+    page = {
+        "limit": limit,
+        "after": args.get("after"),
+        "sort": sort,
+        "descending": order == "desc",
+        "kind": args.get("kind"),
+        "namespace": args.get("namespace"),
+    }
+    for field in ("start_from", "start_to"):
+        if field not in args:
+            page[field] = None
+            continue
+        page[field] = args.get(field, type=int)
+        if page[field] is None:
+            return None, make_response(jsonify(msg="{} must be an integer timestamp".format(field)), 400)
+    return page, None
+
+
+def history_page_response(collection: str, query: dict, page: dict, with_detail: bool = False, decorate=None):
+    try:
+        items, next_after = load_history_page(collection, query, page, with_detail)
+    except ValueError as e:
+        return make_response(jsonify(msg=str(e)), 400)
+    if decorate is not None:
+        decorate(items)
+    return make_response(jsonify(resp=items, next=next_after), 200)
+
+
 @chaos_bp.route('/namespaces')
 def get_namespaces():
     ret = list_namespaces()
@@ -100,7 +154,13 @@ def fault_type_handler(exp_type, fault_type):
 def history_all():
     if request.method == 'GET':
         email = request.headers.get("email")
-        event_list = load_all_chaos(email)
+        with_detail = request.args.get("detail") == "true"
+        page, error = parse_page_args()
+        if error is not None:
+            return error
+        if page is not None:
+            return history_page_response("chaos", {"email": email, "archived": False}, page, with_detail)
+        event_list = load_all_chaos(email, with_detail=with_detail)
         return make_response(jsonify(resp=event_list), 200)
 
     name = request.values.get("name")
@@ -125,6 +185,11 @@ def add_vn_chaos(exp_type):
 def vn_history_all():
     if request.method == 'GET':
         email = request.headers.get("email")
+        page, error = parse_page_args(sort_fields=("_id",), time_filter=False)
+        if error is not None:
+            return error
+        if page is not None:
+            return history_page_response("vn_chaos", {"email": email}, page)
         event_list = load_all_vn_chaos(email)
         return make_response(jsonify(resp=event_list), 200)
     
@@ -173,18 +238,15 @@ def patch_schedule(name: str):
 def schedule_history_all():
     if request.method == 'GET':
         email = request.headers.get("email")
-        schedule_list = load_all_schedules(email)
-        for schedule in schedule_list:
-            schedule_info = get_chaos_info("schedules", schedule['name'])
-            logger.info("schedule info: {}".format(schedule_info))
-            if 'annotations' in schedule_info['metadata'] \
-                    and 'experiment.chaos-mesh.org/pause' in schedule_info['metadata']['annotations']:
-                if schedule_info['metadata']['annotations']['experiment.chaos-mesh.org/pause'] == "true":
-                    schedule['isPaused'] = True
-                else:
-                    schedule['isPaused'] = False
-            else:
-                schedule['isPaused'] = False
+        with_detail = request.args.get("detail") == "true"
+        page, error = parse_page_args()
+        if error is not None:
+            return error
+        if page is not None:
+            return history_page_response("schedule", {"email": email, "archived": False}, page, with_detail,
+                                         decorate=mark_paused_schedules)
+        schedule_list = load_all_schedules(email, with_detail=with_detail)
+        mark_paused_schedules(schedule_list)
         logger.info("schedule list: {}".format(schedule_list))
         return make_response(jsonify(resp=schedule_list), 200)
     # delete
@@ -195,6 +257,19 @@ def schedule_history_all():
     return make_response(jsonify(msg="success" if count == 1 else "fail"), 200)
 
 
+def mark_paused_schedules(schedule_list: list):
+    # 一次列出所有 schedule，按名称关联，不再逐个查询
+    schedule_infos = list_chaos_by_name("schedules")
+    for schedule in schedule_list:
+        schedule_info = schedule_infos.get(schedule['name'])
+        if schedule_info is None:
+            logger.warning("schedule {} not found in chaos mesh".format(schedule['name']))
+            schedule['isPaused'] = False
+            continue
+        annotations = schedule_info['metadata'].get('annotations') or {}
+        schedule['isPaused'] = annotations.get('experiment.chaos-mesh.org/pause') == "true"
+
+
 @chaos_bp.route('/events')
 def get_chaos_events():
     namespace = "chaos-mesh"
@@ -209,13 +284,25 @@ def get_chaos_events():
 @chaos_bp.route('/archives/experiments')
 def archived_experiments_handler():
     email = request.headers.get("email")
-    return make_response(jsonify(get_archived_experiments(email)), 200)
+    with_detail = request.args.get("detail") == "true"
+    page, error = parse_page_args()
+    if error is not None:
+        return error
+    if page is not None:
+        return history_page_response("chaos", {"email": email, "archived": True}, page, with_detail)
+    return make_response(jsonify(get_archived_experiments(email, with_detail=with_detail)), 200)
 
 
 @chaos_bp.route('/archives/schedules')
 def archived_schedules_handler():
     email = request.headers.get("email")
-    return make_response(jsonify(get_archived_schedules(email)), 200)
+    with_detail = request.args.get("detail") == "true"
+    page, error = parse_page_args()
+    if error is not None:
+        return error
+    if page is not None:
+        return history_page_response("schedule", {"email": email, "archived": True}, page, with_detail)
+    return make_response(jsonify(get_archived_schedules(email, with_detail=with_detail)), 200)
 
 
 @chaos_bp.route('/archives/experiments/<name>', methods=['DELETE'])
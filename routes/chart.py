@@ -1,5 +1,9 @@
 from flask import Blueprint, make_response, jsonify, request
 from service.chart import schedule
+from service.chart.series import DOWNSAMPLE_METHODS
+
+# 按时间桶聚合时支持的聚合方式
+BUCKET_STATS = ("avg", "min", "max")
 
 chart_bp = Blueprint('chart', __name__, url_prefix='/chart')
 
@@ -8,6 +12,44 @@ chart_bp = Blueprint('chart', __name__, url_prefix='/chart')
 def get_chart(task_id):
     start_time = request.args.get("start_time")
     end_time = request.args.get("end_time")
-    print(start_time, end_time)
-    chart = schedule.load_chart(task_id,start_time,end_time)
-    return make_response(jsonify(chart), 200)
+    # 可选的降采样参数：每个字段最多返回 max_points 个点
+    max_points = request.args.get("max_points", type=int)
+    downsample = request.args.get("downsample", "lttb")
+    if max_points is not None and max_points < 3:
+        return make_response(jsonify(msg="max_points must be at least 3"), 400)
+    if downsample not in DOWNSAMPLE_METHODS:
+        return make_response(jsonify(msg="downsample must be one of {}".format(", ".join(DOWNSAMPLE_METHODS))), 400)
+    # minmax 至少要保留首尾两个点和一个桶的最小值、最大值
+    if downsample == "minmax" and max_points is not None and max_points < 4:
+        return make_response(jsonify(msg="max_points must be at least 4 for minmax"), 400)
+    # 可选的聚合参数：由 mongo 按 bucket 秒分桶聚合，stats 为逗号分隔的聚合方式
+    bucket = request.args.get("bucket", type=int)
+    stats = tuple(request.args.get("stats", "avg").split(","))
+    if bucket is not None and bucket <= 0:
+        return make_response(jsonify(msg="bucket must be a positive number of seconds"), 400)
+    if not set(stats) <= set(BUCKET_STATS):
+        return make_response(jsonify(msg="stats must be chosen from {}".format(", ".join(BUCKET_STATS))), 400)
+    timings = {}
+    chart = schedule.load_chart(task_id, start_time, end_time, max_points=max_points, downsample=downsample,
+                                bucket=bucket, stats=stats, timings=timings)
+    return timed_response(chart, timings)
+
+
+@chart_bp.route('/<task_id>/since')
+def get_chart_since(task_id):
+    # 实时看板增量刷新：只返回 cursor 之后的数据，前端把返回的 cursor 带到下一次请求
+    cursor = request.args.get("cursor", type=float)
+    end_time = request.args.get("end_time", type=int)
+    if cursor is None:
+        return make_response(jsonify(msg="cursor is required"), 400)
+    timings = {}
+    chart = schedule.load_chart_since(task_id, cursor, end_time=end_time, timings=timings)
+    return timed_response(chart, timings)
+
+
+def timed_response(body, timings: dict):
+    resp = make_response(jsonify(body), 200)
+    # 各后端的耗时，浏览器开发者工具的 Timing 面板可以直接展示
+    if timings:
+        resp.headers["Server-Timing"] = ", ".join("{};dur={:.1f}".format(k, v) for k, v in timings.items())
+    return resp
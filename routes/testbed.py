@@ -12,6 +12,8 @@ from service.chaos import *
 from service.k8s import *
 from service.topology import *
 from service.llm import *
+from service.topology_batch import execute_batch, BatchPlanError, BatchConflictError
+from util.latency import latency
 
 testbed_bp = Blueprint('testbed', __name__, url_prefix='/testbed')
 
@@ -295,6 +297,39 @@ def add_or_delete_topology_element(namespace: str, elementType: str):
             return make_response(jsonify(message="element type {} is not supported".format(elementType)), 400)
 
 
+@testbed_bp.route('/namespaces/<namespace>/topology/batch', methods=['POST'])
+def batch_topology_elements(namespace: str):
+    """
+    批量添加、删除节点，请求体为 {"operations": [...]}，格式见 service/topology_batch.py
+    """
+    if not namespace:
+        return make_response(jsonify(message="namespace cannot be empty"), 400)
+    body = request.get_json(silent=True) or {}
+    try:
+        result = execute_batch(namespace=namespace, operations=body.get("operations"))
+    except BatchPlanError as e:
+        return make_response(jsonify(message=str(e)), 400)
+    except BatchConflictError as e:
+        return make_response(jsonify(message=str(e)), 409)
+    except Exception as e:
+        logger.warning(f"topology batch in {namespace} failed: {e}")
+        return make_response(jsonify(message="batch failed and was rolled back: {}".format(e)), 500)
+    return make_response(jsonify(result), 200)
+
+
+@testbed_bp.route('/topology/latency', methods=['GET', 'DELETE'])
+def topology_latency():
+    """
+    各个拓扑操作和等待步骤的耗时分布，DELETE 清空统计，便于对比一次建网的前后耗时
+    """
+    if request.method == 'DELETE':
+        latency.reset()
+        resp = make_response()
+        resp.status_code = 204
+        return resp
+    return make_response(jsonify(latency.snapshot()), 200)
+
+
 @testbed_bp.route('/namespaces/<namespace>/topology/reboot', methods=['POST'])
 def reboot_topology_element(namespace: str):
     if not namespace:
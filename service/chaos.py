@@ -10,6 +10,7 @@ from loguru import logger
 from config.config import CHAOS_TEMPLATE_DIR, KUBERNETES_CHAOS_CONFIG, NODE_CHAOS_CONFIG, node_address_map, \
     mongo_client_chaos
 from service.file import read_json, read_yaml
+from service.mongo import list_projection
 from service.k8s import watch_event, get_chaos_info, list_pods, get_pod_info
 from service.node_chaos import get_uuid_name
 from service.timeutil import get_timestamp, cal_end_timestamp
@@ -236,36 +237,32 @@ def get_chaos_target(exp_type: str, yaml_dict: dict) -> str:
         return node
 
 
-def get_archived_experiments(email: str) -> list:
-    raw = mongo_client_chaos.get_all(collection="chaos", query={"email": email, "archived": True})
-    records = list(raw)
-    for record in records:
-        del record["_id"]
-    return records
+def get_archived_experiments(email: str, with_detail: bool = False) -> list:
+    raw = mongo_client_chaos.get_all(collection="chaos", query={"email": email, "archived": True},
+                                     projection=list_projection("detail", include_large=with_detail))
+    return list(raw)
 
 
-def get_archived_schedules(email: str) -> list:
-    raw = mongo_client_chaos.get_all(collection="schedule", query={"email": email, "archived": True})
-    records = list(raw)
-    for record in records:
-        del record["_id"]
-    return records
+def get_archived_schedules(email: str, with_detail: bool = False) -> list:
+    raw = mongo_client_chaos.get_all(collection="schedule", query={"email": email, "archived": True},
+                                     projection=list_projection("detail", include_large=with_detail))
+    return list(raw)
+
+
+# 清理过期归档只需要名称和归档时间
+ARCHIVE_CLEANUP_PROJECTION = {"_id": 0, "name": 1, "archived_at": 1}
 
 
 def get_all_archived_experiments() -> list:
-    raw = mongo_client_chaos.get_all(collection="chaos", query={"archived": True})
-    records = list(raw)
-    for record in records:
-        del record["_id"]
-    return records
+    raw = mongo_client_chaos.get_all(collection="chaos", query={"archived": True},
+                                     projection=ARCHIVE_CLEANUP_PROJECTION)
+    return list(raw)
 
 
 def get_all_archived_schedules() -> list:
-    raw = mongo_client_chaos.get_all(collection="schedule", query={"archived": True})
-    records = list(raw)
-    for record in records:
-        del record["_id"]
-    return records
+    raw = mongo_client_chaos.get_all(collection="schedule", query={"archived": True},
+                                     projection=ARCHIVE_CLEANUP_PROJECTION)
+    return list(raw)
 
 
 def delete_archived_experiment(name: str):
@@ -1,14 +1,29 @@
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
+import numpy as np
 import pandas as pd
-import pytz
 from bson.objectid import ObjectId
+from cachetools import TTLCache
 from loguru import logger
 
-from config.config import mongo_client_platform_meta, mongo_client_pure_data, mongo_client_chaos, mongo_client_eval
+from config.config import mongo_client_platform_meta, mongo_client_pure_data, mongo_client_chaos, mongo_client_eval, \
+    CHART_CACHE_MAXSIZE, CHART_CACHE_TTL_SECONDS, CHART_CACHE_BUCKET_SECONDS
 from service.chaos import get_pod_labels
+from service.mongo import TIMESTAMP_INDEX
+from service.chart.series import timestamp_to_datetime, format_timestamps, df_to_series, downsample_indices, \
+    axis_timestamps, snap_to_axis
+from util.run_length import find_runs
+
+# 图表的三类数据（真实数据点、chaos、预测结果）分别来自不同的库和 k8s，彼此独立，放到线程池里并发拉取
+CHART_FETCH_WORKERS = 12
+chart_fetch_executor = ThreadPoolExecutor(max_workers=CHART_FETCH_WORKERS, thread_name_prefix="chart-fetch")
+
+# 自动刷新的看板会在几秒内重复请求同一个区间，按时间桶缓存构建好的图表，同一个桶内只查一次 mongo
+chart_cache = TTLCache(maxsize=CHART_CACHE_MAXSIZE, ttl=CHART_CACHE_TTL_SECONDS)
+chart_cache_lock = threading.Lock()
 
 
 def build_mongo_field_query(target_fields) -> dict:
@@ -26,34 +41,76 @@ def build_mongo_field_query(target_fields) -> dict:
     return target_fields
 
 
-def get_chaos(namespace, pod, start_time=0, end_time=int(time.time()), collection_name="chaos"):
+def build_bucket_pipeline(target_fields, start_time, end_time, bucket: int, stats=("avg",)) -> (list, dict):
+    """
+    构建按时间桶聚合的 mongo pipeline，由数据库完成分桶聚合，只把聚合后的行返回给服务端
+    字段名可能包含 '.'，不能直接作为 $group 的输出字段名，所以先用别名聚合，再映射回原字段名
+    :param target_fields: 目标字段
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param bucket: 桶的宽度，单位秒
+    :param stats: 每个字段需要的聚合，可选 avg/min/max；avg 沿用原字段名，min/max 输出为 字段名_min/字段名_max
+    :return: (pipeline, {别名: 输出列名})
+    """
+    group = {"_id": {"$subtract": ["$timestamp", {"$mod": ["$timestamp", bucket]}]}}
+    aliases = {}
+    for i, field in enumerate(target_fields or []):
+        for stat in stats:
+            alias = "f{}_{}".format(i, stat)
+            group[alias] = {"$" + stat: "$" + field}
+            aliases[alias] = field if stat == "avg" else "{}_{}".format(field, stat)
+
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": start_time, "$lte": end_time}}},
+        {"$group": group},
+        {"$sort": {"_id": 1}},
+    ]
+    return pipeline, aliases
+
+
+def get_chaos(namespace, pod, start_time=0, end_time=None, collection_name="chaos", min_end_time=None):
     """
     从 chaos 表中获取异常信息
     :param pod:
     :param namespace:
     :param start_time:  开始时间
-    :param end_time:  结束时间
+    :param end_time:  结束时间，为空表示当前时间
     :param collection_name:  集合名
-    :return: list of chaos
+    :param min_end_time:  不为空时只返回结束时间不早于它的异常（增量查询时用来找到仍在持续的异常）
+    :return: list of chaos，只包含 start_time 和 end_time
     """
     if namespace == "" or pod == "":
         return []
+    if end_time is None:
+        end_time = int(time.time())
 
     labels = get_pod_labels(namespace, pod)
+    if not labels:
+        return []
+
+    # pod 的所有 label 合并成一次 $in 查询，走 (namespace, label, start_time) 索引
     target_collection = mongo_client_chaos.db[collection_name]
-    chaos = []
-    for label in labels:
-        chaos.extend(
-            list(
-                target_collection.find(
-                    {"namespace": namespace,
-                     "label": label,
-                     "start_time": {"$gte": start_time, "$lte": end_time}
-                     }
-                )
-            )
-        )
-    return chaos
+    query = {"namespace": namespace,
+             "label": {"$in": labels},
+             "start_time": {"$gte": start_time, "$lte": end_time}
+             }
+    if min_end_time is not None:
+        query["end_time"] = {"$gte": min_end_time}
+    return list(target_collection.find(query, {"_id": 0, "start_time": 1, "end_time": 1}))
+
+
+def ensure_task_indexes():
+    """
+    为每个推理任务的数据集合和预测结果集合创建时间戳索引，在服务启动时调用
+    固定集合的索引见 service.mongo.INDEX_MANIFEST
+    """
+    tasks = mongo_client_platform_meta.db["InferenceTask"].find({}, {"_id": 0, "name": 1, "dataSource.name": 1})
+    for task in tasks:
+        collection = task.get("dataSource", {}).get("name")
+        if collection:
+            mongo_client_pure_data.create_index(collection, TIMESTAMP_INDEX)
+        if task.get("name"):
+            mongo_client_eval.create_index(task["name"], TIMESTAMP_INDEX)
 
 
 def get_schedule(task_id):
@@ -68,19 +125,30 @@ def get_schedule(task_id):
     return task
 
 
-def get_point(collection_name, target_fields=None, start_time=0, end_time=int(time.time())):
+def get_point(collection_name, target_fields=None, start_time=0, end_time=None, bucket: int = None,
+              stats=("avg",)):
     """
     从 pure_data 表中获取数据 point
     :param collection_name:  集合名
     :param target_fields:   目标字段
     :param start_time:  开始时间
-    :param end_time:  结束时间
+    :param end_time:  结束时间，为空表示当前时间
+    :param bucket:  时间桶宽度（秒），不为空时在 mongo 中按桶聚合，timestamp 为桶的起始时间
+    :param stats:  按桶聚合时每个字段需要的聚合，见 build_bucket_pipeline
     :return:  pandas dataframe
     """
+    if end_time is None:
+        end_time = int(time.time())
     target_collection = mongo_client_pure_data.db[collection_name]
-    point = list(target_collection.find({"timestamp": {"$gte": start_time, "$lte": end_time}}, build_mongo_field_query(target_fields)))
-    # convert to pandas dataframe
-    df = pd.DataFrame(point)
+    if bucket:
+        pipeline, aliases = build_bucket_pipeline(target_fields, start_time, end_time, bucket, stats)
+        rows = list(target_collection.aggregate(pipeline, allowDiskUse=True))
+        df = pd.DataFrame(rows, columns=["_id"] + list(aliases.keys()))
+        df = df.rename(columns={"_id": "timestamp", **aliases})
+    else:
+        point = list(target_collection.find({"timestamp": {"$gte": start_time, "$lte": end_time}}, build_mongo_field_query(target_fields)))
+        # convert to pandas dataframe
+        df = pd.DataFrame(point)
 
     df.fillna(0, inplace=True)
 
@@ -89,15 +157,17 @@ def get_point(collection_name, target_fields=None, start_time=0, end_time=int(ti
     return df
 
 
-def get_predicted(collection_name, start_time=0, end_time=int(time.time()), target_fields=None) -> list:
+def get_predicted(collection_name, start_time=0, end_time=None, target_fields=None) -> list:
     """
     从 eval 表中获取预测结果
     :param collection_name: 集合名
     :param start_time:  开始时间
-    :param end_time:  结束时间
+    :param end_time:  结束时间，为空表示当前时间
     :param target_fields:  目标字段，一般是预测结果，即 predicted 这一列
     :return:  list of predicted
     """
+    if end_time is None:
+        end_time = int(time.time())
     target_collection = mongo_client_eval.db[collection_name]
     predicted = list(target_collection.find({"timestamp": {"$gte": start_time, "$lte": end_time}}, build_mongo_field_query(target_fields)))
 
@@ -109,42 +179,53 @@ def get_predicted(collection_name, start_time=0, end_time=int(time.time()), targ
     return predicted
 
 
-def build_pred_area(pred: List[dict]):
+def get_last_predicted(collection_name, before_time) -> dict:
+    """
+    获取不晚于 before_time 的最后一条预测结果，增量查询时用来判断异常区域是否跨过了游标
+    :param collection_name: 集合名
+    :param before_time: 时间戳
+    :return: {'timestamp': 1680438689.0, 'predicted': 0}，不存在时返回 None
+    """
+    target_collection = mongo_client_eval.db[collection_name]
+    item = target_collection.find_one({"timestamp": {"$lte": before_time}},
+                                      {"_id": 0, "timestamp": 1, "predicted": 1},
+                                      sort=[("timestamp", -1)])
+    if item is not None and item.get("predicted") is None:
+        item["predicted"] = 0
+    return item
+
+
+def build_pred_area(pred: List[dict], axis=None):
     """
     找出异常区域,给前端显示用，格式参考 echarts 的 markArea
     格式如下： [  [{xAxis: '07:30'}, {xAxis: '10:00'}]  ]
     最外围是一个大的list，里面是一个个的异常区域，每个异常区域是一个list，里面是两个dict，分别是异常区域的起始时间和结束时间，xAxis是前端的x轴
 
     :param pred: 预测结果列表,列表中的每一项是一个dict，包含了预测结果的所有信息 {'timestamp': 1680438689.0, 'predicted': 0}
+    :param axis: 降采样后 x 轴上的时间戳，区域边界会对齐到这些点上，为空表示不对齐
     :return: [[{xAxis: '07:30'}, {xAxis: '10:00'}], [{xAxis: '07:30'}, {xAxis: '10:00'}]]
     """
 
+    if len(pred) == 0:
+        return []
+    timestamps = np.fromiter((item["timestamp"] for item in pred), dtype="float64", count=len(pred))
+    predicted = np.fromiter((item["predicted"] for item in pred), dtype="int8", count=len(pred))
+
+    # 区域的终点是片段之后的第一个 0，片段一直持续到最后时终点是最后一个点
+    runs = find_runs(predicted, 1)
+    starts = timestamps[runs[:, 0]]
+    ends = timestamps[np.minimum(runs[:, 1], len(pred) - 1)]
+
     resp = []
-    length = len(pred)
-    index_i = 0
-    # 这里必须用while循环，不能用for循环，因为for循环中的index 只能连续自增 ，我们需要它跳跃更新
-    while index_i < length:
-        if pred[index_i]["predicted"] == 1:
-            range_start = {"xAxis": timestamp_to_datetime(pred[index_i]["timestamp"])}
-            end_time = 0
-            # 别问我为什么这么写，问就是因为我不知道为什么，我也不想知道为什么，我只想让它能跑起来
-            index_j = index_i + 1008611
-            for index_j in range(index_i + 1, length):
-                if pred[index_j]["predicted"] == 0:
-                    end_time = timestamp_to_datetime(pred[index_j]["timestamp"])
-                    break
-            if end_time == 0:
-                end_time = timestamp_to_datetime(pred[length - 1]["timestamp"])
-            range_end = {"xAxis": end_time}
-            resp.append([range_start, range_end])
-            index_i = index_j + 1
-        else:
-            index_i += 1
+    for start_t, end_t in zip(starts, ends):
+        range_start = {"xAxis": timestamp_to_datetime(snap_to_axis(start_t, axis, "left"))}
+        range_end = {"xAxis": timestamp_to_datetime(snap_to_axis(end_t, axis, "right"))}
+        resp.append([range_start, range_end])
     logger.info(f"build pred area: {resp}")
     return resp
 
 
-def build_chaos_injected_area(chaos: list, max_time: int):
+def build_chaos_injected_area(chaos: list, max_time: int, axis=None):
     """
     构建注入异常区域,给前端显示用
     格式如下： [  [{xAxis: '07:30'}, {xAxis: '10:00'}]  ]
@@ -152,6 +233,7 @@ def build_chaos_injected_area(chaos: list, max_time: int):
 
     :param max_time: 真实数据的时间戳，因为异常注入是具有未来性的，所以注入的异常可能会超过真实数据的时间范围，所以需要传入真实数据的最大时间戳
     :param chaos: 注入异常列表,列表中的每一项是一个dict，包含了注入异常的所有信息 {'target': 'cpu.usage', 'start_time': 1680438689.0, 'end_time': 1680438689.0}
+    :param axis: 降采样后 x 轴上的时间戳，区域边界会对齐到这些点上，为空表示不对齐
     :return: [[{xAxis: '07:30'}, {xAxis: '10:00'}], [{xAxis: '07:30'}, {xAxis: '10:00'}]]
     """
     max_time = int(max_time)
@@ -171,57 +253,60 @@ def build_chaos_injected_area(chaos: list, max_time: int):
         # 如果注入异常的结束时间大于真实数据的最大时间戳，那么就把结束时间设置为真实数据的最大时间戳
         if end_t > max_time:
             end_t = max_time
-        range_start = {"xAxis": timestamp_to_datetime(start_t)}
-        range_end = {"xAxis": timestamp_to_datetime(end_t)}
+        range_start = {"xAxis": timestamp_to_datetime(snap_to_axis(start_t, axis, "left"))}
+        range_end = {"xAxis": timestamp_to_datetime(snap_to_axis(end_t, axis, "right"))}
         resp.append([range_start, range_end])
     return resp
 
 
-def timestamp_to_datetime(timestamp):
+def timed_call(func, *args, **kwargs):
     """
-    时间戳转换成datetime，设置时区为Asia/Shanghai
-    :param timestamp: unix seconds
-    :return: datetime string
+    执行 func 并记录耗时
+    :return: (func 的返回值, 耗时毫秒)
     """
-    # 显式指明时区，避免不必要的麻烦
-    # 时间精确至分钟
-    tz = pytz.timezone("Asia/Shanghai")
-    return datetime.fromtimestamp(timestamp, tz=tz).strftime("%Y-%m-%d %H:%M")
+    begin = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - begin) * 1000
 
 
-def df_to_series(df) -> list:
+def fetch_concurrently(calls: dict, timings: dict = None) -> dict:
+    """
+    在线程池中并发执行互相独立的数据拉取，并记录每个阶段的耗时
+    :param calls: {阶段名: (func, args, kwargs)}
+    :param timings: 不为空时写入各阶段耗时（毫秒），另外 fetch 为整体耗时
+    :return: {阶段名: func 的返回值}
+    """
+    total_begin = time.perf_counter()
+    futures = {stage: chart_fetch_executor.submit(timed_call, func, *args, **kwargs)
+               for stage, (func, args, kwargs) in calls.items()}
+    results = {}
+    stage_ms = {}
+    for stage, future in futures.items():
+        results[stage], stage_ms[stage] = future.result()
+    stage_ms["fetch"] = (time.perf_counter() - total_begin) * 1000
+    logger.info("chart fetch timings(ms): {}".format(", ".join(f"{k}={v:.1f}" for k, v in stage_ms.items())))
+    if timings is not None:
+        timings.update(stage_ms)
+    return results
+
+
+def parse_task_detail(task_detail: dict) -> (str, str, str, str, list):
     """
-    将dataframe转换成 Echarts 需要的series格式
-    :param df:  dataframe
-    :return:  list of series
+    从 InferenceTask 中取出构建图表需要的信息
+    :return: (任务名, 数据集合名, namespace, pod, 选中的字段)
     """
+    task_name = task_detail["name"]
+    collection = task_detail["dataSource"]["name"]
 
-    '''
-       series: [
-          {
-            name: 'cpu.usage',      
-            type: 'line',
-            data: [
-              ['2019-10-10', 200],
-            ]
-          }
-        ]
-    '''
+    try:
+        namespace = task_detail["dataSource"]["properties"]["namespace"]
+        pod = task_detail["dataSource"]["properties"]["pod"]
+    except KeyError:
+        namespace = ""
+        pod = ""
 
-    res = []
-    for column in df.columns:
-        if column == "datetime" or column == "timestamp":
-            continue
-        series = {
-            "name": column,
-            "type": "line",
-            "smooth": True,
-            "data": []
-        }
-        for index, row in df.iterrows():
-            series["data"].append([timestamp_to_datetime(row["timestamp"]), row[column]])
-        res.append(series)
-    return res
+    fields = task_detail["trainTask"]["selectedFields"]
+    return task_name, collection, namespace, pod, fields
 
 
 def create_area_series(area_list, color, area_type="chaos"):
@@ -250,50 +335,87 @@ def create_area_series(area_list, color, area_type="chaos"):
     return series
 
 
-def load_chart(task_id: str, start_time: int, end_time: int):
-    task_detail = get_schedule(task_id)
-    task_name = task_detail["name"]
-    collection = task_detail["dataSource"]["name"]
-
-    try:
-        namespace = task_detail["dataSource"]["properties"]["namespace"]
-        pod = task_detail["dataSource"]["properties"]["pod"]
-    except KeyError:
-        namespace = ""
-        pod = ""
-
+def load_chart(task_id: str, start_time: int, end_time: int, max_points: int = None, downsample: str = "lttb",
+               bucket: int = None, stats=("avg",), timings: dict = None):
+    """
+    构建前端图表需要的全部 series
+    :param task_id: 任务id
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :param max_points: 每个字段最多返回的点数，为空表示返回全部原始点
+    :param downsample: 降采样算法，lttb 或 minmax
+    :param bucket: 时间桶宽度（秒），不为空时由 mongo 按桶聚合后再返回
+    :param stats: 按桶聚合时每个字段需要的聚合，avg/min/max
+    :param timings: 不为空时写入各阶段耗时（毫秒），如 {"points": 12.3, "chaos": 4.5, "predicted": 6.7}
+    :return: {"series": [...]}
+
+    结果按 (task_id, 开始时间桶, 结束时间桶, 其余参数) 缓存 CHART_CACHE_TTL_SECONDS 秒，
+    同一个桶内的请求直接复用缓存、不访问 mongo，因此返回的数据（包括任务的字段列表）最多会滞后
+    CHART_CACHE_TTL_SECONDS 秒
+    """
     time_end = int(end_time)
     time_start = int(start_time)
 
     if time_start >= time_end:
         return {"code": 400, "msg": "start_time must less than end_time"}
 
-    logger.info(f"load chart for: {task_name}, {collection}, {time_start}, {time_end}")
+    cache_key = (task_id, time_start // CHART_CACHE_BUCKET_SECONDS, time_end // CHART_CACHE_BUCKET_SECONDS,
+                 max_points, downsample, bucket, tuple(stats))
+    with chart_cache_lock:
+        chart = chart_cache.get(cache_key)
+    if chart is not None:
+        logger.info(f"chart cache hit for: {task_id}, {time_start}, {time_end}")
+        return chart
 
-    fields = task_detail["trainTask"]["selectedFields"]
+    task_name, collection, namespace, pod, fields = parse_task_detail(get_schedule(task_id))
+    logger.info(f"load chart for: {task_name}, {collection}, {time_start}, {time_end}")
     logger.info(f"fields: {fields}")
     # fields = ["service_memory_usage_bytes"]
 
-    # 拉取真实的数据点
-    gt_frame = get_point(collection, fields, time_start, time_end)
+    chart = build_chart(task_name, collection, namespace, pod, fields, time_start, time_end,
+                        max_points=max_points, downsample=downsample, bucket=bucket, stats=stats, timings=timings)
+    with chart_cache_lock:
+        chart_cache[cache_key] = chart
+    return chart
+
+
+def build_chart(task_name: str, collection: str, namespace: str, pod: str, fields: list, time_start: int,
+                time_end: int, max_points: int = None, downsample: str = "lttb", bucket: int = None, stats=("avg",),
+                timings: dict = None):
+    """
+    拉取数据并构建图表，参数含义见 load_chart
+    :return: {"series": [...]}
+    """
+    # 并发拉取真实的数据点、chaos数据、预测数据
+    fetched = fetch_concurrently({
+        "points": (get_point, (collection, fields, time_start, time_end), {"bucket": bucket, "stats": stats}),
+        "chaos": (get_chaos, (namespace, pod), {"start_time": time_start, "end_time": time_end}),
+        "predicted": (get_predicted, (task_name,),
+                      {"start_time": time_start, "end_time": time_end, "target_fields": ["predicted"]}),
+    }, timings)
+    gt_frame, chaos_info, pred_list = fetched["points"], fetched["chaos"], fetched["predicted"]
+
+    render_begin = time.perf_counter()
     # 找到最大的时间戳
     max_timestamp = gt_frame["timestamp"].max()
 
     # 加一列datetime，前端显示用
-    gt_frame["datetime"] = gt_frame["timestamp"].apply(timestamp_to_datetime)
-    series = df_to_series(gt_frame)
+    gt_frame["datetime"] = format_timestamps(gt_frame["timestamp"].to_numpy())
+
+    # 按需降采样，标记区域需要对齐到降采样后的 x 轴上
+    indices = None
+    axis = None
+    if max_points:
+        indices = downsample_indices(gt_frame, max_points, downsample)
+        axis = axis_timestamps(gt_frame, indices)
+    series = df_to_series(gt_frame, indices)
 
-    # 拉取chaos数据
-    chaos_info = get_chaos(namespace, pod, start_time=time_start, end_time=time_end)
     logger.info(f"chaos info: {chaos_info}")
-    chaos_area = build_chaos_injected_area(chaos_info, max_timestamp)
+    chaos_area = build_chaos_injected_area(chaos_info, max_timestamp, axis)
     logger.info(f"chaos area: {chaos_area}")
 
-    # 拉取预测数据
-    pred_list = get_predicted(task_name, start_time=time_start, end_time=time_end, target_fields=["predicted"])
     # logger.info(f"pred list: {pred_list}")
-
-    pred_area = build_pred_area(pred_list)
+    pred_area = build_pred_area(pred_list, axis)
     logger.info(f"pred area: {pred_area}")
 
     pred_series = create_area_series(pred_area, color="rgba(255, 165, 0, 0.5)", area_type="pred")
@@ -301,9 +423,64 @@ def load_chart(task_id: str, start_time: int, end_time: int):
 
     series.append(pred_series)
     series.append(chaos_series)
+    if timings is not None:
+        timings["render"] = (time.perf_counter() - render_begin) * 1000
     return {"series": series}
 
 
+def load_chart_since(task_id: str, cursor: float, end_time: int = None, timings: dict = None):
+    """
+    增量加载图表，给实时看板用：只返回游标之后的新数据点，以及新出现或被延长的标记区域
+    返回的标记区域如果起点等于前端已有区域的终点（预测区域），或者起点与已有区域相同（chaos 区域），表示对已有区域的延长
+
+    :param task_id: 任务id
+    :param cursor: 前端已有的最后一个数据点的时间戳
+    :param end_time: 结束时间，为空表示当前时间
+    :param timings: 不为空时写入各阶段耗时（毫秒）
+    :return: {"series": [...], "cursor": 新的游标}
+    """
+    task_name, collection, namespace, pod, fields = parse_task_detail(get_schedule(task_id))
+    cursor = float(cursor)
+    time_end = int(end_time) if end_time else int(time.time())
+    if cursor >= time_end:
+        return {"series": [], "cursor": cursor}
+
+    logger.info(f"load chart since: {task_name}, {collection}, {cursor}, {time_end}")
+
+    # 预测区域可能跨过游标，需要带上游标处（含）的最后一条预测结果，才能判断区域是新出现的还是被延长的
+    fetched = fetch_concurrently({
+        "points": (get_point, (collection, fields, cursor, time_end), {}),
+        # chaos 的显示区域有 60s 的偏移，并且只要还没结束就可能被延长
+        "chaos": (get_chaos, (namespace, pod), {"start_time": 0, "end_time": time_end, "min_end_time": cursor - 60}),
+        "anchor": (get_last_predicted, (task_name, cursor), {}),
+        "predicted": (get_predicted, (task_name,),
+                      {"start_time": cursor, "end_time": time_end, "target_fields": ["predicted"]}),
+    }, timings)
+
+    gt_frame = fetched["points"]
+    if gt_frame.empty:
+        return {"series": [], "cursor": cursor}
+    gt_frame = gt_frame[gt_frame["timestamp"] > cursor]
+    if gt_frame.empty:
+        return {"series": [], "cursor": cursor}
+
+    max_timestamp = gt_frame["timestamp"].max()
+    series = df_to_series(gt_frame)
+
+    # 查询时已经排除了完全落在游标之前的 chaos，剩下的是新出现或者仍在延长的区域
+    chaos_area = build_chaos_injected_area(fetched["chaos"], max_timestamp)
+
+    # 与数据点一样截止到新的游标，游标之后的预测结果留给下一次请求，避免重复返回
+    pred_list = [item for item in fetched["predicted"] if cursor < item["timestamp"] <= max_timestamp]
+    if fetched["anchor"] is not None:
+        pred_list.insert(0, fetched["anchor"])
+    pred_area = build_pred_area(pred_list)
+
+    series.append(create_area_series(pred_area, color="rgba(255, 165, 0, 0.5)", area_type="pred"))
+    series.append(create_area_series(chaos_area, color="rgba(255, 0, 0, 0.5)", area_type="chaos"))
+    return {"series": series, "cursor": float(max_timestamp)}
+
+
 if __name__ == '__main__':
     # load_chart("6429757bb5e0f259b61b2414", start_time=int(time.time()) - 3600, end_time=int(time.time()))
 
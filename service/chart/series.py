@@ -0,0 +1,212 @@
+"""
+    Echarts series 的构建工具，全部基于 pandas / numpy 的列式操作，不依赖数据库和 k8s，便于单独做基准测试
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+# 降采样算法：lttb 保留曲线形状，minmax 保留每个桶内的极值
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+# 前端展示统一使用北京时间，精确到分钟
+CHART_TIMEZONE = "Asia/Shanghai"
+CHART_DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+_chart_tz = pytz.timezone(CHART_TIMEZONE)
+
+
+def timestamp_to_datetime(timestamp):
+    """
+    时间戳转换成datetime，设置时区为Asia/Shanghai
+    :param timestamp: unix seconds
+    :return: datetime string
+    """
+    # 显式指明时区，避免不必要的麻烦
+    # 时间精确至分钟
+    return datetime.fromtimestamp(timestamp, tz=_chart_tz).strftime(CHART_DATETIME_FORMAT)
+
+
+def format_timestamps(timestamps) -> np.ndarray:
+    """
+    timestamp_to_datetime 的向量化版本
+    因为只精确到分钟，所以先把时间戳按分钟去重，只格式化去重后的分钟，再映射回原数组，秒级数据可以少做 60 倍的格式化
+    :param timestamps: unix seconds 数组
+    :return: object 类型的 datetime string 数组，长度与输入一致
+    """
+    ts = np.asarray(timestamps, dtype="float64")
+    if ts.size == 0:
+        return np.empty(0, dtype=object)
+
+    minutes = np.floor_divide(ts, 60).astype("int64")
+    unique_minutes, inverse = np.unique(minutes, return_inverse=True)
+    labels = pd.to_datetime(unique_minutes * 60, unit="s", utc=True) \
+        .tz_convert(CHART_TIMEZONE) \
+        .strftime(CHART_DATETIME_FORMAT)
+    return np.asarray(labels, dtype=object)[inverse.reshape(-1)]
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回被保留的点的下标
+    每个桶内选取与「上一个被选中的点」和「下一个桶的均值点」构成三角形面积最大的点
+    :param x: 横坐标（时间戳）
+    :param y: 纵坐标
+    :param threshold: 保留的点数
+    :return: 升序的下标数组
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    indices = np.empty(threshold, dtype="int64")
+    indices[0] = 0
+    indices[-1] = length - 1
+    # 首尾两点固定保留，中间的点平均分到 threshold - 2 个桶里
+    every = (length - 2) / (threshold - 2)
+    selected = 0
+    for i in range(threshold - 2):
+        bucket_start = int(i * every) + 1
+        bucket_end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, length)
+
+        avg_x = x[bucket_end:next_end].mean()
+        avg_y = y[bucket_end:next_end].mean()
+
+        area = np.abs((x[selected] - avg_x) * (y[bucket_start:bucket_end] - y[selected])
+                      - (x[selected] - x[bucket_start:bucket_end]) * (avg_y - y[selected]))
+        selected = bucket_start + int(area.argmax())
+        indices[i + 1] = selected
+    return indices
+
+
+def minmax_indices(y, threshold: int) -> np.ndarray:
+    """
+    最大最小值分桶降采样，每个桶保留最小值和最大值两个点，返回被保留的点的下标
+    :param y: 纵坐标
+    :param threshold: 保留的点数（上限）
+    :return: 升序的下标数组
+    """
+    y = np.asarray(y, dtype="float64")
+    length = len(y)
+    if threshold >= length or threshold < 4:
+        return np.arange(length)
+
+    bucket_count = (threshold - 2) // 2
+    edges = np.linspace(1, length - 1, bucket_count + 1).astype("int64")
+    picked = [0, length - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if start >= end:
+            continue
+        bucket = y[start:end]
+        picked.append(start + int(bucket.argmin()))
+        picked.append(start + int(bucket.argmax()))
+    return np.unique(picked)
+
+
+def downsample_indices(df, max_points: int, method: str = "lttb") -> dict:
+    """
+    对 dataframe 中的每个字段分别降采样
+    :param df: dataframe，必须包含 timestamp 列
+    :param max_points: 每个字段最多保留的点数
+    :param method: lttb 或 minmax
+    :return: {字段名: 保留的下标数组}
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"unsupported downsample method: {method}")
+
+    timestamps = df["timestamp"].to_numpy(dtype="float64")
+    indices = {}
+    for column in df.columns:
+        if column == "datetime" or column == "timestamp":
+            continue
+        values = pd.to_numeric(df[column], errors="coerce").fillna(0).to_numpy(dtype="float64")
+        if method == "lttb":
+            indices[column] = lttb_indices(timestamps, values, max_points)
+        else:
+            indices[column] = minmax_indices(values, max_points)
+    return indices
+
+
+def axis_timestamps(df, indices: dict = None) -> np.ndarray:
+    """
+    降采样之后前端 x 轴上实际存在的时间戳（所有字段保留点的并集）
+    :param df: dataframe，必须包含 timestamp 列
+    :param indices: downsample_indices 的返回值，为空表示未降采样
+    :return: 升序去重后的时间戳数组
+    """
+    timestamps = df["timestamp"].to_numpy(dtype="float64")
+    if indices:
+        timestamps = timestamps[np.concatenate(list(indices.values()))]
+    return np.unique(timestamps)
+
+
+def snap_to_axis(timestamp, axis, side: str = "left"):
+    """
+    把标记区域的边界对齐到 x 轴上存在的点，保证降采样后 markArea 仍然能落在坐标轴上
+    :param timestamp: 需要对齐的时间戳
+    :param axis: 升序的 x 轴时间戳
+    :param side: left 向前取不大于它的点（区域起点），right 向后取不小于它的点（区域终点）
+    :return: 对齐后的时间戳
+    """
+    if axis is None or len(axis) == 0:
+        return timestamp
+    if side == "left":
+        pos = np.searchsorted(axis, timestamp, side="right") - 1
+    else:
+        pos = np.searchsorted(axis, timestamp, side="left")
+    pos = min(max(pos, 0), len(axis) - 1)
+    return float(axis[pos])
+
+
+def df_to_series(df, indices: dict = None) -> list:
+    """
+    将dataframe转换成 Echarts 需要的series格式
+    时间列只格式化一次（优先复用已有的 datetime 列），每个字段按列整体生成 data
+    :param df:  dataframe，必须包含 timestamp 列
+    :param indices: 每个字段保留的下标（见 downsample_indices），为空表示输出全部的点
+    :return:  list of series
+    """
+
+    '''
+       series: [
+          {
+            name: 'cpu.usage',
+            type: 'line',
+            data: [
+              ['2019-10-10', 200],
+            ]
+          }
+        ]
+    '''
+
+    if df.empty or "timestamp" not in df.columns:
+        return []
+
+    if "datetime" in df.columns:
+        labels = df["datetime"].to_numpy(dtype=object)
+    else:
+        labels = format_timestamps(df["timestamp"].to_numpy())
+
+    res = []
+    for column in df.columns:
+        if column == "datetime" or column == "timestamp":
+            continue
+        values = df[column].to_numpy(dtype=object)
+        if indices is not None:
+            keep = indices[column]
+            column_labels, values = labels[keep], values[keep]
+        else:
+            column_labels = labels
+        # object 数组中的数值在 tolist 时会转换为 python 原生类型，可以直接 jsonify
+        data = np.column_stack((column_labels, values)).tolist()
+        res.append({
+            "name": column,
+            "type": "line",
+            "smooth": True,
+            "data": data
+        })
+    return res
@@ -1,66 +1,31 @@
-import re
 from datetime import datetime
 from loguru import logger
 
-from service.k8s import load_topology_yaml, get_targetPod_IP, exec_ping_or_traceroute_command, load_config
-from config.config import mongo_client_eval
-
-
-def parse_ping_output(output: str):
-    try:
-        loss_match = re.search(r'(\d+(?:\.\d+)?)% packet loss', output)
-        rtt_match = re.search(r'rtt min/avg/max/mdev = [\d\.]+/([\d\.]+)/', output)
-        loss = float(loss_match.group(1)) if loss_match else -1.0
-        avg_rtt = float(rtt_match.group(1)) if rtt_match else -1.0
-        return avg_rtt, loss
-    except Exception as e:
-        logger.warning(f"Error parsing ping output: {str(e)}")
-        return -1.0, -1.0
+from service.k8s import load_topology_yaml, probe_topology_links, link_metric_doc, load_config
+from config.config import mongo_client_eval, LINK_METRICS_TS_SUFFIX
 
 
 def evaluate_topology_links(namespace: str, task: str = "network_metrics"):
-    """增强版链路评估函数"""
+    """
+    增强版链路评估函数
+    结果写入时序集合 evaluation.<task>_ts，旧格式（source/target/loss_percent/link_id）的 evaluation.<task> 不再写入
+    """
     try:
-        # 获取拓扑数据
+        load_config()
+        # 获取拓扑数据，所有链路的目标 IP 都从这一份快照中解析
         topology_docs = load_topology_yaml(namespace)
-        updated_count = 0
-        
-        # 获取MongoDB集合
-        collection = mongo_client_eval.evaluation[task]  # 使用evaluation数据库
-        
-        for doc in topology_docs["items"]:
-            if doc['kind'] != 'Topology':
-                continue
-                
-            node_name = doc['metadata']['name']
-            for link in doc['spec'].get('links', []):
-                try:
-                    # 执行ping测试
-                    output = exec_ping_or_traceroute_command(
-                        namespace, 
-                        node_name, 
-                        get_targetPod_IP(namespace, link['peer_pod']),
-                        "ping"
-                    )
-                    latency, loss = parse_ping_output(output)
-                    
-                    # 写入MongoDB
-                    collection.insert_one({
-                        "timestamp": datetime.utcnow(),
-                        "source": node_name,
-                        "target": link['peer_pod'],
-                        "latency_ms": latency,
-                        "loss_percent": loss,
-                        "link_id": link['uid']
-                    })
-                    updated_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"链路 {node_name}->{link['peer_pod']} 测试失败: {str(e)}")
-        
-        logger.success(f"成功写入 {updated_count} 条链路指标到 evaluation.{task}")
+        results = probe_topology_links(namespace, topology_docs)
+
+        # 一轮探测使用同一个采样时间，缓存后一次写入 evaluation 数据库的时序集合
+        timestamp = datetime.utcnow()
+        docs = [link_metric_doc(result, timestamp) for result in results]
+        collection = task + LINK_METRICS_TS_SUFFIX
+        mongo_client_eval.ensure_timeseries_collection(collection)
+        mongo_client_eval.insert_many(collection, docs, ordered=False)
+
+        logger.success(f"成功写入 {len(docs)} 条链路指标到 evaluation.{collection}")
         return True
-        
+
     except Exception as e:
         logger.critical(f"拓扑评估全局错误: {str(e)}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,128 @@
+"""
+    异常检测评估：给预测结果打上真实标签，并计算各项指标
+"""
+import threading
+from itertools import islice
+
+import numpy as np
+from cachetools import TTLCache
+from loguru import logger
+from sklearn.metrics import precision_score, recall_score, f1_score, confusion_matrix
+
+from config.config import mongo_client_eval, mongo_client_chaos, EVAL_CACHE_MAXSIZE, EVAL_CACHE_TTL_SECONDS, \
+    EVAL_BATCH_SIZE
+from util.interval import merge_intervals, label_in_intervals
+from util.run_length import find_runs
+from util.target_transform import transform
+
+# 看板会同时请求多个指标，缓存打好标签的结果，同一个区间只查询和标注一次
+labelled_cache = TTLCache(maxsize=EVAL_CACHE_MAXSIZE, ttl=EVAL_CACHE_TTL_SECONDS)
+labelled_cache_lock = threading.Lock()
+
+
+def get_labelled_set(task: str, target: str, start_time: int, end_time: int) -> (np.ndarray, np.ndarray):
+    """
+    获取 start_time 和 end_time 之间的预测结果，并根据异常注入区间打上真实标签
+    返回的数组会被缓存共享，调用方不要原地修改
+    :param task: 任务名，即预测结果所在的集合
+    :param target: 异常注入的目标，如 node_metrics_aiops-k8s1
+    :param start_time: 开始时间
+    :param end_time: 结束时间
+    :return: (predicted, ground_truth)，按时间排序的 int8 数组
+    """
+    key = (task, target, start_time, end_time)
+    with labelled_cache_lock:
+        cached = labelled_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # 设置查询语句,查询 target 的所有异常注入信息
+    # todo 这里的查询条件可能需要修改,因为异常注入的结束时间可能不准确
+    records = list(mongo_client_chaos.get_all("chaos", {"target": transform(target)}))
+
+    # 异常注入区间先排序合并，再对每个预测点二分查找，避免逐个区间比较
+    chaos_starts, chaos_ends = merge_intervals([(r['start_time'], r['end_time']) for r in records])
+
+    # 只查询 start_time 和 end_time 之间的所有预测结果,只需要预测结果字段
+    query = {
+        "timestamp": {"$gte": start_time, "$lte": end_time},
+    }
+    predicted, ground_truth = stream_labelled(mongo_client_eval.db[task], query, chaos_starts, chaos_ends)
+
+    logger.info("labelled {} predictions with {} chaos records for task:{} target:{}".format(
+        len(predicted), len(records), task, target))
+
+    labelled = (predicted, ground_truth)
+    with labelled_cache_lock:
+        labelled_cache[key] = labelled
+    return labelled
+
+
+def stream_labelled(collection, query: dict, chaos_starts: np.ndarray, chaos_ends: np.ndarray,
+                    batch_size: int = EVAL_BATCH_SIZE) -> (np.ndarray, np.ndarray):
+    """
+    分批读取游标，直接写入预先分配好的 int8 数组，每批只在内存中保留 batch_size 个文档
+    :param collection: 预测结果所在的集合
+    :param query: 查询条件
+    :param chaos_starts: merge_intervals 返回的起点
+    :param chaos_ends: merge_intervals 返回的终点
+    :param batch_size: 每批读取的文档数
+    :return: (predicted, ground_truth)，按时间排序的 int8 数组
+    """
+    # 先按文档数预分配，查询期间有新的预测结果写入时再扩容
+    capacity = collection.count_documents(query)
+    predicted = np.zeros(capacity, dtype="int8")
+    ground_truth = np.zeros(capacity, dtype="int8")
+
+    cursor = collection.find(query, {"_id": 0, "predicted": 1, "timestamp": 1}) \
+        .sort("timestamp", 1) \
+        .batch_size(batch_size)
+    size = 0
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            break
+        end = size + len(batch)
+        if end > capacity:
+            capacity = max(end, capacity * 2)
+            predicted = np.resize(predicted, capacity)
+            ground_truth = np.resize(ground_truth, capacity)
+        # 如果这个事件点在异常注入区间内，则标记为异常
+        timestamps = np.fromiter((record["timestamp"] for record in batch), dtype="float64", count=len(batch))
+        ground_truth[size:end] = label_in_intervals(timestamps, chaos_starts, chaos_ends)
+        predicted[size:end] = np.fromiter((record.get("predicted") or 0 for record in batch), dtype="int8",
+                                          count=len(batch))
+        size = end
+    return predicted[:size], ground_truth[:size]
+
+
+def point_adjust(predicted: np.ndarray, ground_truth: np.ndarray) -> np.ndarray:
+    """
+    point-adjust：只要一个真实异常片段内有任意一个点被预测为异常，就认为整个片段都被检测到了
+    :param predicted: 预测结果
+    :param ground_truth: 真实标签
+    :return: 调整后的预测结果（新数组）
+    """
+    adjusted = np.array(predicted, dtype="int8", copy=True)
+    for start, end in find_runs(ground_truth, 1):
+        if adjusted[start:end].any():
+            adjusted[start:end] = 1
+    return adjusted
+
+
+def compute_metrics(predicted: np.ndarray, ground_truth: np.ndarray) -> dict:
+    """
+    一次计算所有评估指标
+    :param predicted: 预测结果
+    :param ground_truth: 真实标签
+    :return: precision、recall、f1、混淆矩阵和 point-adjust 之后的 f1
+    """
+    (tn, fp), (fn, tp) = confusion_matrix(ground_truth, predicted, labels=[0, 1])
+    return {
+        "precision": float(precision_score(ground_truth, predicted, zero_division=0)),
+        "recall": float(recall_score(ground_truth, predicted, zero_division=0)),
+        "f1": float(f1_score(ground_truth, predicted, zero_division=0)),
+        "confusion_matrix": {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)},
+        "point_adjusted_f1": float(f1_score(ground_truth, point_adjust(predicted, ground_truth), zero_division=0)),
+        "count": int(len(predicted)),
+    }
@@ -1,41 +1,63 @@
 from datetime import datetime
 
 from config.config import mongo_client_chaos
+from service.mongo import list_projection
 from .k8s import delete_chaos
 
 
-def load_all_chaos(email: str):
+def load_all_chaos(email: str, with_detail: bool = False):
     """
     get all chaos experiments created by specific user.
     :param email: user email
+    :param with_detail: whether to return the "detail" object returned by chaos mesh
     :return: a list of chaos experiments
     """
-    cursor = mongo_client_chaos.get_all(collection="chaos", query={"email": email, "archived": False})
-    raw = list(cursor)
-    for item in raw:
-        del item["_id"]
-    return raw
+    cursor = mongo_client_chaos.get_all(collection="chaos", query={"email": email, "archived": False},
+                                        projection=list_projection("detail", include_large=with_detail))
+    return list(cursor)
 
 
 def load_all_vn_chaos(email: str):
-    cursor = mongo_client_chaos.get_all(collection="vn_chaos", query={"email": email})
-    raw = list(cursor)
-    for item in raw:
-        del item["_id"]
-    return raw
+    cursor = mongo_client_chaos.get_all(collection="vn_chaos", query={"email": email}, projection=list_projection())
+    return list(cursor)
 
 
-def load_all_schedules(email: str):
+def load_all_schedules(email: str, with_detail: bool = False):
     """
     get all chaos experiments created by specific user.
     :param email: user email
+    :param with_detail: whether to return the "detail" object returned by chaos mesh
     :return: a pred of chaos
     """
-    cursor = mongo_client_chaos.get_all(collection="schedule", query={"email": email, "archived": False})
-    raw = list(cursor)
-    for item in raw:
-        del item["_id"]
-    return raw
+    cursor = mongo_client_chaos.get_all(collection="schedule", query={"email": email, "archived": False},
+                                        projection=list_projection("detail", include_large=with_detail))
+    return list(cursor)
+
+
+def load_history_page(collection: str, query: dict, page: dict, with_detail: bool = False):
+    """
+    分页读取 chaos 库中的历史记录（实验、定时实验、虚拟网络故障和归档）
+    :param collection: chaos / schedule / vn_chaos
+    :param query: 基本的查询条件，如 {"email": email, "archived": False}
+    :param page: 分页参数 {"limit", "after", "sort", "descending"}，以及可选的过滤条件 kind、namespace、start_from、start_to
+    :param with_detail: 是否返回 chaos mesh 返回的 detail
+    :return: (本页记录, 下一页的游标)
+    """
+    query = dict(query)
+    for field in ("kind", "namespace"):
+        if page.get(field):
+            query[field] = page[field]
+    time_range = {}
+    if page.get("start_from") is not None:
+        time_range["$gte"] = page["start_from"]
+    if page.get("start_to") is not None:
+        time_range["$lte"] = page["start_to"]
+    if time_range:
+        query["start_time"] = time_range
+    return mongo_client_chaos.get_page(collection, query,
+                                       projection=list_projection("detail", include_large=with_detail),
+                                       sort_field=page["sort"], descending=page["descending"],
+                                       after=page.get("after"), limit=page["limit"])
 
 
 def archive_experiment_by_name(name: str):
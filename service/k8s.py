@@ -1,6 +1,11 @@
 import time
 import os
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import yaml
+import pandas as pd
+from cachetools import TTLCache
 from kubernetes import client, config, utils, watch
 from kubernetes.client import ApiException, AppsV1Api
 from kubernetes.utils import FailToCreateError
@@ -8,18 +13,22 @@ from kubernetes.stream import stream
 from loguru import logger
 from requests import HTTPError
 
-from service.mongo import MongoConnectClient
 import re
 from datetime import datetime
 from loguru import logger
 
-mongo = MongoConnectClient(host="k8s.personai.cn", db="chaos", port=30332) 
-
-from config.config import ignore_ns, custom_object_dict
+from config.config import ignore_ns, custom_object_dict, LINK_PROBE_CONCURRENCY, \
+    LINK_PROBE_CONCURRENCY_BY_NAMESPACE, LINK_PROBE_BATCH, CHAOS_LIST_CACHE_TTL_SECONDS, POD_READY_TIMEOUT_SECONDS, \
+    LINK_METRICS_TS_SUFFIX
+# 与 config 中的 chaos 库共用同一个连接池
+from config.config import mongo_client_chaos as mongo
 from service.netservice import *
 import grpc
 
 from service.topology_vis import NetworkTopologyLayout
+from service.topology_cache import TopologyCache
+from service.pod_waiter import PodReadinessWaiter
+from util.latency import timed
 import networkx as nx
 
 try:
@@ -34,6 +43,10 @@ k8s_client = client.ApiClient()
 custom_api = client.CustomObjectsApi()
 k8s_watch = watch.Watch()
 rbac_api = client.RbacAuthorizationV1Api()
+# Topology 的读取都走这个缓存，本服务对 Topology 的修改完成后需要调用 record_write / record_delete
+topology_cache = TopologyCache(custom_api)
+# 等待 pod 就绪都走这里，同一个 namespace 下同时等待的 pod 共用一个 watch
+pod_waiter = PodReadinessWaiter(v1)
 
 
 def create_serviceaccount_and_rolebinding_for_namespace(namespace: str):
@@ -255,12 +268,7 @@ def getPodInfoByLabel(namespace: str, label: str) -> dict:
 def list_topology(namespace: str) -> dict:
     try:
         # 查询指定命名空间下的CRD实例
-        topology = custom_api.list_namespaced_custom_object(
-            group=custom_object_dict["Topology"]["group"],
-            version=custom_object_dict["Topology"]["version"],
-            namespace=namespace,
-            plural=custom_object_dict["Topology"]["plural"],
-        )
+        topology = topology_cache.snapshot(namespace)
         topology_dict = {
             "nodes": [],
             "edges": [],
@@ -307,13 +315,10 @@ def list_topology(namespace: str) -> dict:
 def delete_topology_link(namespace: str, name: str, uid: str):
     try:
         # 获取uid对应的接口和索引以便删除和更新
-        topology = custom_api.get_namespaced_custom_object(
-            group=custom_object_dict["Topology"]["group"],
-            version=custom_object_dict["Topology"]["version"],
-            namespace=namespace,
-            plural=custom_object_dict["Topology"]["plural"],
-            name=name,
-        )
+        topology = topology_cache.get(namespace, name)
+        if topology is None:
+            logger.warning(f"Topology {name} not found in namespace {namespace}")
+            return False
         logger.info(f"Topology {name} in namespace {namespace}: {topology}")
 
         # 查找链接的接口和索引
@@ -361,6 +366,7 @@ def delete_topology_link(namespace: str, name: str, uid: str):
                 }
             }
         )
+        topology_cache.record_write(namespace, updated_crd)
         logger.info(f"Updated topology {name} in namespace {namespace}: {updated_crd}")
         return True
     except client.exceptions.ApiException as e:
@@ -373,13 +379,10 @@ def delete_topology_link(namespace: str, name: str, uid: str):
 def delete_topology_node(namespace: str, name: str):
     try:
         # 获取uid对应的接口和索引以便删除和更新
-        topology = custom_api.get_namespaced_custom_object(
-            group=custom_object_dict["Topology"]["group"],
-            version=custom_object_dict["Topology"]["version"],
-            namespace=namespace,
-            plural=custom_object_dict["Topology"]["plural"],
-            name=name,
-        )
+        topology = topology_cache.get(namespace, name)
+        if topology is None:
+            logger.warning(f"Topology {name} not found in namespace {namespace}")
+            return False
         # 先去清除与该node相邻的所有节点的链接
         for link in topology["spec"]["links"]:
             delete_topology_link(namespace=namespace, name=link["peer_pod"], uid=link["uid"])
@@ -406,6 +409,7 @@ def delete_topology_node(namespace: str, name: str):
                 grace_period_seconds=0  # 立即删除
             )
         )
+        topology_cache.record_delete(namespace, name)
         return True
     except client.exceptions.ApiException as e:    
         logger.warning(f"Error deleting topology node {name}: {str(e)}")
@@ -480,6 +484,8 @@ def apply_from_yaml(yaml_content: dict, namespace: str):
                 body=yaml_content,
                 pretty=True,
             )
+            if yaml_content["kind"] == "Topology":
+                topology_cache.record_write(namespace, resp)
         else:
             resp = utils.create_from_dict(k8s_client, yaml_content, namespace=namespace)
     except FailToCreateError as e1:
@@ -489,6 +495,38 @@ def apply_from_yaml(yaml_content: dict, namespace: str):
     else:
         return True, resp
 
+# chaos-mesh namespace 下各类对象的列表缓存：{plural: {name: object}}
+chaos_list_cache = TTLCache(maxsize=32, ttl=CHAOS_LIST_CACHE_TTL_SECONDS)
+chaos_list_cache_lock = threading.Lock()
+
+
+def list_chaos_by_name(plural: str) -> dict:
+    """
+    一次列出 chaos-mesh namespace 下的某类对象并按名称索引，结果缓存 CHAOS_LIST_CACHE_TTL_SECONDS 秒
+    返回的对象会被缓存共享，调用方不要修改
+    :param plural: 如 schedules
+    :return: {name: object}
+    """
+    with chaos_list_cache_lock:
+        cached = chaos_list_cache.get(plural)
+    if cached is not None:
+        return cached
+    resp = custom_api.list_namespaced_custom_object(
+        group="chaos-mesh.org",
+        version="v1alpha1",
+        namespace="chaos-mesh",
+        plural=plural)
+    objects = {item["metadata"]["name"]: item for item in resp["items"]}
+    with chaos_list_cache_lock:
+        chaos_list_cache[plural] = objects
+    return objects
+
+
+def invalidate_chaos_list(plural: str):
+    with chaos_list_cache_lock:
+        chaos_list_cache.pop(plural, None)
+
+
 # 创建混沌实验
 def create_chaos(plural: str, yaml_dict: dict):
     try:
@@ -503,6 +541,7 @@ def create_chaos(plural: str, yaml_dict: dict):
     except (ApiException, HTTPError) as e:
         return False, e
     else:
+        invalidate_chaos_list(plural)
         return True, resp
 
 
@@ -551,6 +590,7 @@ def delete_chaos(plural: str, name: str):
     except (ApiException, HTTPError) as e:
         return False, e
     else:
+        invalidate_chaos_list(plural)
         return True, resp
 
 
@@ -575,6 +615,7 @@ def annotate_chaos(plural: str, name: str, key: str, value: str):
             "metadata": {"annotations": {key: value}}
         }
     )
+    invalidate_chaos_list(plural)
 
 
 def get_pod_info(namespace: str, pod_name: str):
@@ -616,13 +657,10 @@ def get_pod_interfaces_info(namespace: str, pod_name: str):
 def get_targetPod_IP(namespace: str, name: str):
     try:
         # 获取uid对应的接口和索引以便删除和更新
-        topology = custom_api.get_namespaced_custom_object(
-            group=custom_object_dict["Topology"]["group"],
-            version=custom_object_dict["Topology"]["version"],
-            namespace=namespace,
-            plural=custom_object_dict["Topology"]["plural"],
-            name=name,
-        )
+        topology = topology_cache.get(namespace, name)
+        if topology is None:
+            logger.warning(f"Topology {name} not found in namespace {namespace}")
+            return ""
         logger.info(f"Topology {name} in namespace {namespace}: {topology}")
 
         for link in topology["spec"]["links"]:
@@ -639,7 +677,14 @@ def exec_ping_or_traceroute_command(namespace: str, source: str, target: str, ac
     if targetIP == "":
         logger.info(f"get ip is null in name {target}, namespace {namespace}")
         return None
+    return exec_ping_or_traceroute_ip(namespace, source, targetIP, action)
+
 
+def exec_ping_or_traceroute_ip(namespace: str, source: str, targetIP: str, action: str):
+    """
+    在 source pod 中对目标 IP 执行 ping 或 traceroute，目标 IP 已知时可以省去一次 Topology 查询
+    :return: {"output": 命令输出}，执行失败时返回 None
+    """
     if action == "ping":
         command = ["ping", "-c", "4", targetIP]
     elif action == "traceroute":
@@ -708,57 +753,27 @@ def delete_pod(namespace: str, pod_name: str):  # 删除指定pod，并监测其
 
 
 def check_pod_running(namespace: str, pod_name: str):
-    pod_info = None
-    while pod_info == None:
-        pod_info = get_pod_info(namespace, pod_name)
-        time.sleep(3)
-    pod_running = False
-    MAX_RETRY = 10
-    retry_count = 0
-
-    while True:
-        if pod_info.status.phase in ("Failed", "Succeeded"):
-            raise RuntimeError(f"Pod {pod_name} exited with unexpected phase")
-
-        # 确保 container_statuses 存在且非空
-        container_statuses = getattr(pod_info.status, "container_statuses", None)
-        if container_statuses is None:
-            logger.warning(f"No container statuses found for pod {pod_name}, retrying...")
-            containers_ready = False
+    """
+    等待 pod 进入 Running 且所有容器就绪
+    :return: 是否在 POD_READY_TIMEOUT_SECONDS 内就绪
+    :raise RuntimeError: pod 退出或在等待期间被删除
+    """
+    return wait_pods_running(namespace=namespace, pod_names=[pod_name])[pod_name]
+
+
+@timed("pod.wait_running")
+def wait_pods_running(namespace: str, pod_names: list) -> dict:
+    """
+    同时等待多个 pod 就绪，共用一个 watch 和一个超时时间
+    :return: pod 名称 -> 是否就绪
+    """
+    running = pod_waiter.wait_ready(namespace, pod_names, timeout=POD_READY_TIMEOUT_SECONDS)
+    for name, ok in running.items():
+        if ok:
+            logger.info(f"Pod {name} now running")
         else:
-            # 检查所有容器就绪状态
-            containers_ready = all(
-                container.ready for container in container_statuses
-            )
-
-        is_running = pod_info.status.phase == "Running"
-        
-        if is_running and containers_ready:
-            pod_running = True
-            break
-
-        # 超时检测
-        retry_count += 1
-        if retry_count > MAX_RETRY:
-            pod_running = False
-            break
-            
-        # 指数退避重试
-        sleep_time = min(2 ** (retry_count // 5), 30)  # 最大间隔30秒
-        logger.warning(f"Current phase: {pod_info.status.phase}. Retrying in {sleep_time}s...")
-        time.sleep(sleep_time)
-
-        try:
-            pod_info = get_pod_info(namespace, pod_name)
-        except ApiException as e:
-            if e.status == 404:
-                logger.warning("Pod deleted during waiting, aborting")
-                raise
-            logger.warning(f"API error: {e}")
-            continue
-    
-    logger.info(f"Pod {pod_name} now running")
-    return pod_running
+            logger.warning(f"Pod {name} is not running after {POD_READY_TIMEOUT_SECONDS}s")
+    return running
 
 
 def get_pod_original_yaml(pod_name: str, namespace: str = "default") -> dict:
@@ -817,7 +832,7 @@ def update_topology_yaml(topology_yaml: list, namespace: str):
     for doc in topology_yaml["items"]:
         if doc['kind'] == 'Topology':
             try:
-                client.CustomObjectsApi(k8s_client).patch_namespaced_custom_object(
+                updated_crd = client.CustomObjectsApi(k8s_client).patch_namespaced_custom_object(
                     group="networkop.co.uk",
                     version="v1beta1",
                     namespace=namespace,
@@ -825,23 +840,31 @@ def update_topology_yaml(topology_yaml: list, namespace: str):
                     name=doc['metadata']['name'],
                     body=doc
                 )
+                topology_cache.record_write(namespace, updated_crd)
             except Exception as e:
                 logger.warning(f"Error updating topology for {doc['metadata']['name']}: {str(e)}")
 
 
-def update_topology_item_link(namespace: str, topology: dict, name: str):
+def update_topology_item_link(namespace: str, topology: dict, name: str, resource_version: str = None):
+    """
+    :param resource_version: 给定时作为前置条件，对象在此之后被修改过则 apiserver 返回 409
+    """
+    body = {
+        "spec": {
+            "links": topology["spec"]["links"]
+        }
+    }
+    if resource_version:
+        body["metadata"] = {"resourceVersion": resource_version}
     updated_crd = custom_api.patch_namespaced_custom_object(
         group=custom_object_dict["Topology"]["group"],
         version=custom_object_dict["Topology"]["version"],
         namespace=namespace,
         plural=custom_object_dict["Topology"]["plural"],
         name=name,
-        body={
-            "spec": {
-                "links": topology["spec"]["links"]
-            }
-        }
+        body=body
     )
+    topology_cache.record_write(namespace, updated_crd)
     logger.info(f"Updated topology {name} in namespace {namespace}: {updated_crd}")
     return True
 
@@ -854,6 +877,7 @@ def add_topology_item(namespace: str, topology_item_doc: dict):
         plural=custom_object_dict["Topology"]["plural"],
             body=topology_item_doc
         )
+    topology_cache.record_write(namespace, updated_crd)
     logger.info(f"add new topology item in namespace {namespace}: {updated_crd}")
     return True
 
@@ -870,6 +894,7 @@ def delete_topology_item(namespace: str, name: str):
             grace_period_seconds=0
         )
     )
+    topology_cache.record_delete(namespace, name)
     logger.info(f"delete topology item in namespace {namespace}: {response}")
     return True
 
@@ -943,13 +968,23 @@ def load_config():
 
 
 def load_topology_yaml(namespace: str) -> list:
-    topology = custom_api.list_namespaced_custom_object(
+    """
+    从 Topology 缓存中读取 namespace 下的所有 Topology，返回值格式与 list_namespaced_custom_object 相同
+    返回的是深拷贝，调用方修改后需要通过 update_topology_item_link 等函数写回
+    """
+    return topology_cache.snapshot(namespace)
+
+
+def list_topology_namespaces() -> list:
+    """
+    列出所有存在 Topology 的 namespace，即部署了虚拟网络的 namespace
+    """
+    topology = custom_api.list_cluster_custom_object(
         group=custom_object_dict["Topology"]["group"],
         version=custom_object_dict["Topology"]["version"],
-        namespace=namespace,
         plural=custom_object_dict["Topology"]["plural"],
     )
-    return topology
+    return sorted({item["metadata"]["namespace"] for item in topology["items"]})
 
 
 def generate_host_pod_yaml(hostname: str, default_route: str) -> dict:
@@ -1325,10 +1360,15 @@ def generate_flow_controller_yaml(namespace: str) -> dict:
     }
     return gf_deployment_yaml
 
+# 同时兼容 iputils（rtt min/avg/max/mdev）和 busybox（round-trip min/avg/max）的 ping 输出
+PING_LOSS_PATTERN = r'(\d+(?:\.\d+)?)% packet loss'
+PING_RTT_PATTERN = r'(?:rtt|round-trip) min/avg/max(?:/mdev)? = [\d\.]+/([\d\.]+)/'
+
+
 def parse_ping_output(output: str):
     try:
-        loss_match = re.search(r'(\d+(?:\.\d+)?)% packet loss', output)
-        rtt_match = re.search(r'rtt min/avg/max/mdev = [\d\.]+/([\d\.]+)/', output)
+        loss_match = re.search(PING_LOSS_PATTERN, output)
+        rtt_match = re.search(PING_RTT_PATTERN, output)
         loss = float(loss_match.group(1)) if loss_match else -1.0
         avg_rtt = float(rtt_match.group(1)) if rtt_match else -1.0
         return avg_rtt, loss
@@ -1336,45 +1376,202 @@ def parse_ping_output(output: str):
         logger.warning(f"Error parsing ping output: {str(e)}")
         return -1.0, -1.0
 
-def evaluate_topology_links(namespace: str):
-    load_config()
-    topology_docs = load_topology_yaml(namespace=namespace)
-    updated_docs = []
 
+def parse_batch_ping_output(output: str) -> pd.DataFrame:
+    """
+    解析 exec_batch_ping 的输出，每一行都以目标 IP 开头
+    :return: index 为目标 IP，包含 latency_ms 和 loss_rate_percent 两列，解析不到的值为 -1
+    """
+    lines = pd.Series((output or "").splitlines(), dtype="object")
+    parts = lines.str.extract(r'^(?P<ip>\S+) (?P<text>.*)$').dropna()
+    parts["latency_ms"] = parts["text"].str.extract(PING_RTT_PATTERN, expand=False).astype("float64")
+    parts["loss_rate_percent"] = parts["text"].str.extract(PING_LOSS_PATTERN, expand=False).astype("float64")
+    # 每个 IP 的统计信息分布在不同的行上，分组后各取第一个非空值
+    return parts.groupby("ip")[["latency_ms", "loss_rate_percent"]].first().fillna(-1.0)
+
+
+def exec_batch_ping(namespace: str, source: str, target_ips: list, count: int = 4) -> pd.DataFrame:
+    """
+    在 source pod 中只执行一次 exec，后台并发 ping 所有目标 IP，每行输出以目标 IP 开头
+    :param target_ips: 目标 IP 列表
+    :return: parse_batch_ping_output 的结果，exec 失败时返回 None
+    """
+    # IP 会拼接进 shell 脚本，先校验格式
+    target_ips = [str(ipaddress.ip_address(ip)) for ip in target_ips]
+    script = ('probe() { ping -c %d -q "$1" 2>&1 | while read -r line; do echo "$1 $line"; done; }; '
+              'for ip in %s; do probe "$ip" & done; wait') % (count, " ".join(target_ips))
+    try:
+        resp = stream(
+            v1.connect_get_namespaced_pod_exec,
+            name=source,
+            namespace=namespace,
+            container="pod",
+            command=["sh", "-c", script],
+            stderr=True,
+            stdin=False,
+            stdout=True,
+            tty=False
+        )
+    except client.exceptions.ApiException as e:
+        logger.warning(f"Failed to execute batch ping in pod {source}: {e}")
+        return None
+    return parse_batch_ping_output(resp)
+
+
+def topology_ip_map(topology_docs: dict) -> dict:
+    """
+    从一次 Topology 列表快照中取出每个节点的 IP，规则与 get_targetPod_IP 一致（第一条链路的 local_ip，去掉掩码）
+    :param topology_docs: load_topology_yaml 的返回值
+    :return: {节点名: IP}
+    """
+    ip_map = {}
     for doc in topology_docs["items"]:
-        if doc['kind'] != 'Topology':
+        links = doc["spec"].get("links") or []
+        if links and links[0].get("local_ip"):
+            ip_map[doc["metadata"]["name"]] = links[0]["local_ip"].split("/")[0]
+    return ip_map
+
+
+def topology_unique_links(topology_docs: dict) -> list:
+    """
+    列出拓扑中的所有链路，A->B 和 B->A 是同一条链路，只保留第一次出现的方向
+    :param topology_docs: load_topology_yaml 的返回值
+    :return: [(源节点, 对端节点, uid)]
+    """
+    seen = set()
+    links = []
+    for doc in topology_docs["items"]:
+        if doc.get('kind', 'Topology') != 'Topology':
             continue
-
         node_name = doc['metadata']['name']
-        links = doc['spec'].get('links', [])
+        for link in doc['spec'].get('links', []):
+            peer_pod = link['peer_pod']
+            key = link.get('uid', frozenset((node_name, peer_pod)))
+            if key in seen:
+                continue
+            seen.add(key)
+            links.append((node_name, peer_pod, link.get('uid')))
+    return links
+
+
+def probe_topology_links(namespace: str, topology_docs: dict = None, batch: bool = LINK_PROBE_BATCH) -> list:
+    """
+    并发 ping 拓扑中的所有链路，每条链路只探测一次，目标 IP 全部从同一个 Topology 快照中解析
+    并发数由 LINK_PROBE_CONCURRENCY_BY_NAMESPACE / LINK_PROBE_CONCURRENCY 配置
+    :param namespace: 虚拟网络所在的 namespace
+    :param topology_docs: load_topology_yaml 的返回值，为空时重新获取
+    :param batch: 为 True 时每个源节点只 exec 一次，在 pod 内并发 ping 它的所有对端；否则每条链路 exec 一次
+    :return: [{"uid", "src_pod", "dst_pod", "latency_ms", "loss_rate_percent"}]，探测失败的链路不在结果中
+    """
+    if topology_docs is None:
+        topology_docs = load_topology_yaml(namespace=namespace)
+    ip_map = topology_ip_map(topology_docs)
+    links = []
+    for node_name, peer_pod, uid in topology_unique_links(topology_docs):
+        if not ip_map.get(peer_pod):
+            logger.warning(f"Cannot get target IP for {peer_pod}")
+            continue
+        links.append((node_name, peer_pod, uid))
+
+    def link_result(link, latency, loss_rate):
+        node_name, peer_pod, uid = link
+        return {
+            "uid": uid,
+            "src_pod": node_name,
+            "dst_pod": peer_pod,
+            "latency_ms": latency,
+            "loss_rate_percent": loss_rate,
+        }
+
+    def probe(link):
+        node_name, peer_pod, uid = link
+        try:
+            resp = exec_ping_or_traceroute_ip(namespace, node_name, ip_map[peer_pod], "ping")
+            if resp is None:
+                return []
+            latency, loss_rate = parse_ping_output(resp["output"])
+        except Exception as e:
+            logger.warning(f"Failed to evaluate link {node_name} -> {peer_pod}: {str(e)}")
+            return []
+        return [link_result(link, latency, loss_rate)]
+
+    def probe_source(source_links):
+        node_name = source_links[0][0]
+        try:
+            stats = exec_batch_ping(namespace, node_name, [ip_map[link[1]] for link in source_links])
+        except Exception as e:
+            logger.warning(f"Failed to evaluate links of {node_name}: {str(e)}")
+            return []
+        if stats is None:
+            return []
+        results = []
+        for link in source_links:
+            ip = ip_map[link[1]]
+            if ip in stats.index:
+                results.append(link_result(link, float(stats.at[ip, "latency_ms"]),
+                                           float(stats.at[ip, "loss_rate_percent"])))
+            else:
+                results.append(link_result(link, -1.0, -1.0))
+        return results
 
+    if batch:
+        by_source = {}
         for link in links:
-            peer_pod = link['peer_pod']
-            uid = link['uid']
+            by_source.setdefault(link[0], []).append(link)
+        tasks, func = list(by_source.values()), probe_source
+    else:
+        tasks, func = links, probe
+
+    workers = LINK_PROBE_CONCURRENCY_BY_NAMESPACE.get(namespace, LINK_PROBE_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks) or 1)),
+                            thread_name_prefix=f"link-probe-{namespace}") as executor:
+        results = [r for rs in executor.map(func, tasks) for r in rs]
+    logger.info(f"probed {len(results)}/{len(links)} links with {len(tasks)} execs in namespace {namespace}")
+    return results
+
+
+def link_metric_doc(result: dict, timestamp: datetime = None) -> dict:
+    """
+    将一条链路的探测结果转换成时序集合中的文档，链路的两端和 uid 放在 meta 字段中
+    :param result: probe_topology_links 返回的一项
+    :param timestamp: 采样时间，为空时使用当前时间
+    """
+    return {
+        "timestamp": timestamp or datetime.utcnow(),
+        "meta": {"src": result["src_pod"], "dst": result["dst_pod"], "uid": result["uid"]},
+        "latency_ms": result["latency_ms"],
+        "loss_rate_percent": result["loss_rate_percent"],
+    }
 
-            try:
-                target_ip = get_targetPod_IP(namespace, peer_pod)
-                if not target_ip:
-                    logger.warning(f"Cannot get target IP for {peer_pod}")
-                    continue
 
-                output = exec_ping_or_traceroute_command(namespace, node_name, target_ip, command_type="ping")
-                latency, loss_rate = parse_ping_output(output)
+def evaluate_topology_links(namespace: str):
+    load_config()
+    topology_docs = load_topology_yaml(namespace=namespace)
+    results = probe_topology_links(namespace, topology_docs)
 
-                mongo.insert_one("link_metrics", {
-                    "uid": uid,
-                    "src_pod": node_name,
-                    "dst_pod": peer_pod,
-                    "latency_ms": latency,
-                    "loss_rate_percent": loss_rate,
-                    "timestamp": datetime.utcnow()
-                })
+    # 一轮探测的结果一次性写入时序集合，旧格式的 link_metrics 集合不再写入，见 LINK_METRICS_TS_SUFFIX
+    collection = "link_metrics" + LINK_METRICS_TS_SUFFIX
+    mongo.ensure_timeseries_collection(collection)
+    timestamp = datetime.utcnow()
+    mongo.insert_many(collection, [link_metric_doc(result, timestamp) for result in results], ordered=False)
 
-                link['latency_ms'] = latency
-                link['loss_rate_percent'] = loss_rate
+    # 对称链路只探测了一次，两个方向使用同一个结果
+    by_link = {}
+    for result in results:
+        by_link[(result["src_pod"], result["dst_pod"])] = result
+        by_link[(result["dst_pod"], result["src_pod"])] = result
 
-            except Exception as e:
-                logger.warning(f"Failed to evaluate link {node_name} -> {peer_pod}: {str(e)}")
+    updated_docs = []
+    for doc in topology_docs["items"]:
+        if doc['kind'] != 'Topology':
+            continue
+
+        node_name = doc['metadata']['name']
+        for link in doc['spec'].get('links', []):
+            result = by_link.get((node_name, link['peer_pod']))
+            if result is not None:
+                link['latency_ms'] = result["latency_ms"]
+                link['loss_rate_percent'] = result["loss_rate_percent"]
 
         updated_docs.append(doc)
 
@@ -0,0 +1,101 @@
+"""
+    后台链路采样：定期探测每个虚拟网络的链路延迟和丢包率，写入 evaluation 数据库
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from loguru import logger
+
+from config.config import LINK_SAMPLE_INTERVAL_SECONDS, LINK_SAMPLE_JITTER_SECONDS, LINK_SAMPLE_DISCOVERY_SECONDS, \
+    LINK_SAMPLE_TASK
+from service.evaluation_helper import evaluate_topology_links
+from service.k8s import list_topology_namespaces
+
+LINK_SAMPLE_JOB_PREFIX = "link-sample-"
+
+# 手动触发的采样在这里执行，不占用 HTTP 线程
+manual_sample_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="link-sample")
+
+# 每个 namespace 最近一次采样的状态
+sampler_status = {}
+sampler_status_lock = threading.Lock()
+
+
+def sample_namespace(namespace: str, task: str = LINK_SAMPLE_TASK) -> bool:
+    """
+    探测一个 namespace 的所有链路，上一轮还没结束时直接跳过
+    :return: 是否执行了采样
+    """
+    with sampler_status_lock:
+        status = sampler_status.setdefault(namespace, {"namespace": namespace, "running": False})
+        if status["running"]:
+            logger.info(f"link sample for {namespace} is still running, skip")
+            return False
+        status["running"] = True
+        status["last_start"] = time.time()
+
+    begin = time.perf_counter()
+    success = False
+    try:
+        success = evaluate_topology_links(namespace, task)
+    finally:
+        duration = time.perf_counter() - begin
+        with sampler_status_lock:
+            status["running"] = False
+            status["last_duration_seconds"] = round(duration, 3)
+            status["last_success"] = bool(success)
+        logger.info(f"link sample for {namespace} finished in {duration:.1f}s, success: {success}")
+    return True
+
+
+def trigger_sample(namespace: str) -> bool:
+    """
+    在后台线程中立即采样一次
+    :return: False 表示该 namespace 正在采样，本次不会执行
+    """
+    with sampler_status_lock:
+        if sampler_status.get(namespace, {}).get("running"):
+            return False
+    manual_sample_executor.submit(sample_namespace, namespace)
+    return True
+
+
+def get_sampler_status() -> list:
+    with sampler_status_lock:
+        return [dict(status) for status in sampler_status.values()]
+
+
+def sync_sample_jobs(scheduler):
+    """
+    为每个存在 Topology 的 namespace 注册一个采样任务，删除已经不存在的 namespace 的任务
+    """
+    try:
+        namespaces = set(list_topology_namespaces())
+    except Exception as e:
+        logger.warning(f"list topology namespaces failed: {e}")
+        return
+
+    existing = {job.id[len(LINK_SAMPLE_JOB_PREFIX):] for job in scheduler.get_jobs()
+                if job.id.startswith(LINK_SAMPLE_JOB_PREFIX)}
+    for namespace in namespaces - existing:
+        # jitter 让各个 namespace 的探测时间错开，max_instances=1 保证上一轮没结束时跳过本轮
+        scheduler.add_job(func=sample_namespace, args=(namespace,), trigger="interval",
+                          seconds=LINK_SAMPLE_INTERVAL_SECONDS, jitter=LINK_SAMPLE_JITTER_SECONDS,
+                          id=LINK_SAMPLE_JOB_PREFIX + namespace, max_instances=1, coalesce=True)
+        logger.info(f"registered link sample job for {namespace}")
+    for namespace in existing - namespaces:
+        scheduler.remove_job(LINK_SAMPLE_JOB_PREFIX + namespace)
+        with sampler_status_lock:
+            sampler_status.pop(namespace, None)
+        logger.info(f"removed link sample job for {namespace}")
+
+
+def register_link_sampler(scheduler):
+    """
+    在 BackgroundScheduler 上注册 namespace 发现任务，启动时立即执行一次
+    """
+    scheduler.add_job(func=sync_sample_jobs, args=(scheduler,), trigger="interval",
+                      seconds=LINK_SAMPLE_DISCOVERY_SECONDS, id="discover-link-sample-namespaces",
+                      max_instances=1, coalesce=True, next_run_time=datetime.now())
@@ -3,6 +3,7 @@ from langchain.agents import Tool
 from langgraph.prebuilt import create_react_agent
 from langchain.tools import StructuredTool
 from service.topology import *
+from service.topology_batch import execute_batch
 import os
 import re
 import json
@@ -114,14 +115,11 @@ def generate_virtualnetwork_config_parameters(subnetCount, routerCount, subnetRo
 
 
 def check_node_existence(nodes, exist_nodes, topology_docs, err_message):
+    existing_names = {doc['metadata']['name'] for doc in topology_docs["items"]}
     for node in nodes:
-        flag = False
-        for doc in topology_docs["items"]:
-            if node == doc['metadata']['name']:
-                exist_nodes.append(node)
-                flag = True
-                break
-        if not flag:
+        if node in existing_names:
+            exist_nodes.append(node)
+        else:
             if not err_message:
                 err_message += node
             else:
@@ -149,45 +147,28 @@ def add_nodes_for_already_exist_nodes(nodes, namespace):  # nodes = {"sw1": [2,
 
     err_message = check_node_existence(nodes=node_names, exist_nodes=exist_nodes, topology_docs=topology_docs, err_message=err_message)
     logger.info(f"exist nodes: {exist_nodes}")
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = []
-        for node in exist_nodes:
-            for i in range(3):
-                if node.startswith("sw"):
-                    if i == 0:
-                        for _ in range(nodes[node][i]):
-                            futures.append(executor.submit(add_host, namespace, node))
-                            time.sleep(2)
-                    if i == 1:
-                        for _ in range(nodes[node][i]):
-                            futures.append(executor.submit(add_switch_for_switch, namespace, node))
-                            time.sleep(2)
-                    if i == 2 and nodes[node][i] > 0:
-                        err_message += "不能为交换机添加路由器。"
-
-                elif node.startswith("r"):
-                    if i == 0 and nodes[node][i] > 0:
-                        err_message += "不能为路由器直接添加主机。"
-                    if i == 1:
-                        for _ in range(nodes[node][i]):
-                            futures.append(executor.submit(add_switch_for_router, namespace, node))
-                            time.sleep(2)
-                    if i == 2:
-                        for _ in range(nodes[node][i]):
-                            futures.append(executor.submit(add_router, namespace, node))
-                            time.sleep(2)
+    # 所有新节点在同一个快照上规划，每个已有节点只 PATCH 一次，pod 并行创建
+    operations = []
+    for node in exist_nodes:
+        if node.startswith("sw"):
+            operations += [{"op": "add", "kind": "host", "peer": node}] * nodes[node][0]
+            operations += [{"op": "add", "kind": "switch", "peer": node}] * nodes[node][1]
+            if nodes[node][2] > 0:
+                err_message += "不能为交换机添加路由器。"
+        elif node.startswith("r"):
+            if nodes[node][0] > 0:
+                err_message += "不能为路由器直接添加主机。"
+            operations += [{"op": "add", "kind": "switch", "peer": node}] * nodes[node][1]
+            operations += [{"op": "add", "kind": "router", "peer": node}] * nodes[node][2]
 
     final_message += err_message
-    suc_cnt = 0
-    fail_cnt = 0
-    for future in concurrent.futures.as_completed(futures):     
-        if future.result() != None:
-            suc_cnt += 1
-        else:
-            fail_cnt += 1
-
-    if suc_cnt > 0 or fail_cnt > 0:
-        final_message += f"成功添加{suc_cnt}个节点, {fail_cnt}个节点添加失败。"
+    if operations:
+        try:
+            result = execute_batch(namespace=namespace, operations=operations)
+            final_message += f"成功添加{len(result['created'])}个节点, 0个节点添加失败。"
+        except Exception as e:
+            logger.warning(f"add nodes for {exist_nodes} failed: {e}")
+            final_message += f"成功添加0个节点, {len(operations)}个节点添加失败。"
     return final_message
                 
 
@@ -206,16 +187,19 @@ def add_new_subnet(routername_list, namespace):  # 为已存在的路由器添
     with concurrent.futures.ThreadPoolExecutor() as executor:  # 并行添加sw
         futures_sw = []
         for routername in exist_routers:
+            # 等上一个交换机写入 Topology 之后再提交，避免分配到相同的名称和子网
+            before = topology_node_names(namespace)
             futures_sw.append(executor.submit(add_switch_for_router, namespace, routername))
-            time.sleep(2)
+            wait_topology_node_added(namespace, before)
 
     with concurrent.futures.ThreadPoolExecutor() as executor_host:  # 并行添加host
         futures_host = []
         for future_sw in concurrent.futures.as_completed(futures_sw):    
             if future_sw.result() != None:
                 suc_message += f"{future_sw.result()}添加成功。"
+                before = topology_node_names(namespace)
                 futures_host.append(executor_host.submit(add_host, namespace, future_sw.result()))
-                time.sleep(2)
+                wait_topology_node_added(namespace, before)
             else:
                 err_message += f"{future_sw.result()}添加失败。" 
     
@@ -244,19 +228,19 @@ def delete_all_hosts_for_switches(switchname_list, namespace):
     with concurrent.futures.ThreadPoolExecutor() as executor:
         futures = []
         hosts = []
+        graph = TopologyGraph(topology_docs)
         for switchname in exist_switches:
-            for doc in topology_docs["items"]:
-                if doc['metadata']['name'] == switchname:
-                    for link in doc['spec']['links']:
-                        if link['peer_pod'].startswith("host"):
-                            hosts.append(link['peer_pod'])
+            for peer in graph.neighbors(switchname):
+                if peer.startswith("host"):
+                    hosts.append(peer)
             
             if not hosts:
                 err_message += f"{switchname}没有连接主机。"
             else:
                 for host in hosts:
                     futures.append(executor.submit(delete_host, namespace, hostname=host))
-                    time.sleep(3)
+                    # 等对端交换机的 links 修改完再提交下一个，避免并发修改同一个交换机时相互覆盖
+                    wait_topology_node_detached(namespace, host)
     
     suc_cnt = 0
     fail_cnt = 0
@@ -296,7 +280,7 @@ def delete_nodes(nodes, namespace):
         for node in exist_nodes:
             future = executor.submit(delete_node_helper, node)
             futures[future] = node
-            time.sleep(2)  # 每隔两秒触发函数执行
+            wait_topology_node_detached(namespace, node)  # 上一个节点从拓扑中摘除之后再触发下一个
         
         for future in concurrent.futures.as_completed(futures):
             node = futures[future]
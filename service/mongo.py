@@ -1,26 +1,141 @@
 """
     MongoDB 连接的客户端
 """
+import base64
+import json
+import threading
 
+from bson import ObjectId
 from pymongo import MongoClient
-from pymongo.errors import OperationFailure
+from pymongo.errors import OperationFailure, CollectionInvalid
 from loguru import logger
 
 
+# 服务查询用到的索引：(数据库, 集合) -> 索引列表，启动时通过 apply_index_manifest 创建
+# 新增查询时在这里补充索引，并在 benchmarks/check_query_plans.py 中补充对应的查询，确保不会全表扫描
+INDEX_MANIFEST = {
+    ("chaos", "chaos"): [
+        # 历史记录和归档列表按 _id 或 start_time 分页
+        [("email", 1), ("archived", 1), ("_id", 1)],
+        [("email", 1), ("archived", 1), ("start_time", 1), ("_id", 1)],
+        [("archived", 1)],
+        [("name", 1)],
+        [("namespace", 1), ("label", 1), ("start_time", 1)],
+        [("target", 1)],
+    ],
+    ("chaos", "schedule"): [
+        [("email", 1), ("archived", 1), ("_id", 1)],
+        [("email", 1), ("archived", 1), ("start_time", 1), ("_id", 1)],
+        [("archived", 1)],
+        [("name", 1)],
+        [("namespace", 1)],
+    ],
+    ("chaos", "vn_chaos"): [
+        [("email", 1), ("_id", 1)],
+    ],
+    ("vn_chaos", "vn_chaos"): [
+        [("namespace", 1)],
+    ],
+    ("aiops", "benchmark"): [
+        [("email", 1), ("name", 1)],
+        [("visibility", 1)],
+    ],
+    ("aiops", "benchmark-files"): [
+        [("email", 1), ("benchmarkName", 1), ("dirPath", 1), ("fileName", 1)],
+    ],
+    ("aiops", "testbed"): [
+        [("email", 1), ("namespace", 1)],
+    ],
+}
+
+# 按时间范围查询的数据集合和预测结果集合（集合名随任务变化）使用的索引
+TIMESTAMP_INDEX = [("timestamp", 1)]
+
+
+def list_projection(*large_fields, include_large=False) -> dict:
+    """
+    列表视图使用的投影：不返回 _id，include_large 为 False 时也不返回 large_fields 中的大字段
+    例如 list_projection("detail") -> {"_id": 0, "detail": 0}
+    """
+    excluded = ("_id",) + (() if include_large else large_fields)
+    return {field: 0 for field in excluded}
+
+
+def encode_page_cursor(sort_value, last_id: ObjectId) -> str:
+    """
+    将上一页最后一条记录的排序值和 _id 编码成对前端不透明的游标
+    """
+    raw = json.dumps([sort_value, str(last_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_page_cursor(cursor: str):
+    """
+    encode_page_cursor 的逆操作，游标不合法时抛出 ValueError
+    :return: (sort_value, _id)
+    """
+    try:
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, ObjectId(last_id)
+    except Exception as e:
+        raise ValueError("invalid page cursor: {}".format(cursor)) from e
+
+
+def apply_index_manifest(client: MongoClient, manifest: dict = None):
+    """
+    创建 manifest 中的所有索引，索引已存在时 mongo 不会重复创建，可以在每次启动时调用
+    :param client: MongoClient，所有数据库共用
+    :param manifest: 默认为 INDEX_MANIFEST
+    """
+    if manifest is None:
+        manifest = INDEX_MANIFEST
+    for (db, collection), indexes in manifest.items():
+        for keys in indexes:
+            client[db][collection].create_index(keys)
+    logger.info("applied {} indexes on {} collections".format(sum(len(v) for v in manifest.values()), len(manifest)))
+
+
+# 同一个 mongodb 地址和账号共用一个 MongoClient（即同一个连接池），不同的数据库只是它上面的 handle
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(host="localhost", port=27017, username="root", password="root", **pool_options) -> MongoClient:
+    """
+    获取共享的 MongoClient，不存在时创建
+    连接是惰性的（connect=False），第一次执行操作时才会建立连接，导入模块时不会打开 socket
+    :param pool_options: 连接池参数，如 maxPoolSize、minPoolSize、maxIdleTimeMS、serverSelectionTimeoutMS，
+                         只在第一次创建时生效
+    """
+    key = (host, port, username, password)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = MongoClient(host=host, port=port, username=username, password=password, connect=False,
+                                 **pool_options)
+            _shared_clients[key] = client
+        return client
+
+
 class MongoConnectClient:
-    def __init__(self, host="localhost", db="sock-shop", port=27017, username="root", password="root"):
+    def __init__(self, host="localhost", db="sock-shop", port=27017, username="root", password="root",
+                 **pool_options):
         """
         :param host: str mongodb地址
         :param db: str 数据库
         :param port: int 端口，默认为27017
         :param username: str 用户名
         :param password: str 密码
+        :param pool_options: 连接池参数，见 get_shared_client
         """
         host = host
         db = db
         self.port = port
-        self.client = MongoClient(host=host, port=port, username=username, password=password)
+        self.client = get_shared_client(host=host, port=port, username=username, password=password,
+                                        **pool_options)
         self.db = self.client[db]
+        # 已经确认过的时序集合，避免每次写入都查询一次
+        self.timeseries_collections = set()
 
     def insert_one(self, collection, dic):
         """
@@ -33,16 +148,52 @@ class MongoConnectClient:
 
         return rep
 
-    def insert_many(self, collection, lists):
+    def insert_many(self, collection, lists, ordered=True):
         """
         :param lists: 要插入的列表，列表中的元素为字典
         :param collection: str 数据库中的集合
-        :return: 返回包含多个ObjectId类型的列表对象
+        :param ordered: bool 为 False 时服务端可以并行写入，单条失败不影响其余的记录
+        :return: 返回包含多个ObjectId类型的列表对象，列表为空时返回 None
         """
+        if not lists:
+            return None
         collection = self.db[collection]
-        rep = collection.insert_many(lists)
+        rep = collection.insert_many(lists, ordered=ordered)
         return rep
 
+    def ensure_timeseries_collection(self, collection, time_field="timestamp", meta_field="meta",
+                                     granularity="seconds"):
+        """
+        确保 collection 是一个时序集合，不存在时自动创建，已存在时不做任何修改
+        服务端不支持时序集合（MongoDB 5.0 以下）时退化为普通集合；已存在的是普通集合时只记录警告，不会转换
+        :param collection: str 集合名称
+        :param time_field: str 时间字段，必须是 datetime 类型
+        :param meta_field: str 元数据字段，写入时相同元数据的记录会存放在一起
+        :param granularity: str 采样粒度，seconds / minutes / hours
+        """
+        if collection in self.timeseries_collections:
+            return
+        existing = list(self.db.list_collections(filter={"name": collection}))
+        if existing:
+            if existing[0].get("type") != "timeseries":
+                logger.warning("collection {} already exists and is not a time-series collection, "
+                               "documents will be written to it as a normal collection".format(collection))
+        else:
+            try:
+                self.db.create_collection(collection, timeseries={
+                    "timeField": time_field,
+                    "metaField": meta_field,
+                    "granularity": granularity,
+                })
+                logger.info("created time-series collection {}".format(collection))
+            except CollectionInvalid:
+                # 其他进程已经创建了
+                pass
+            except OperationFailure as e:
+                logger.warning("create time-series collection {} failed, fallback to normal collection: {}"
+                               .format(collection, e))
+        self.timeseries_collections.add(collection)
+
     def get_counts(self, collection):
         """
         获取表里的数据总数
@@ -58,16 +209,58 @@ class MongoConnectClient:
         """
         return self.db[collection].find_one(query)
 
-    def get_all(self, collection, query=None):
+    def get_all(self, collection, query=None, projection=None):
         """
         获取某个 collection 的所有数据
         :param query: 查询语句
         :param collection: collection名称
+        :param projection: 返回的字段，如 {"_id": 0, "detail": 0}，为空时返回全部字段
         :return: 所有的Object
         """
         if query is None:
             query = {}
-        return self.db[collection].find(query)
+        return self.db[collection].find(query, projection)
+
+    def get_page(self, collection, query=None, projection=None, sort_field="_id", descending=True, after=None,
+                 limit=50):
+        """
+        keyset 分页：按 (sort_field, _id) 排序，从上一页最后一条记录之后继续读取，每页的查询量与 skip 无关
+        :param collection: collection名称
+        :param query: 查询语句
+        :param projection: 排除式的投影，如 {"_id": 0, "detail": 0}，_id 会在生成游标后再去掉
+        :param sort_field: 排序字段，需要有 (查询字段..., sort_field, _id) 的索引才能避免内存排序
+        :param descending: 是否倒序
+        :param after: 上一页返回的游标，为空表示第一页
+        :param limit: 每页的记录数
+        :return: (本页记录, 下一页的游标)，没有下一页时游标为 None
+        """
+        query = dict(query or {})
+        op = "$lt" if descending else "$gt"
+        direction = -1 if descending else 1
+        if after is not None:
+            sort_value, last_id = decode_page_cursor(after)
+            if sort_field == "_id":
+                query["_id"] = {op: last_id}
+            else:
+                query = {"$and": [query, {"$or": [{sort_field: {op: sort_value}},
+                                                  {sort_field: sort_value, "_id": {op: last_id}}]}]}
+        sort = [("_id", direction)] if sort_field == "_id" else [(sort_field, direction), ("_id", direction)]
+
+        # 生成游标需要 _id，取回之后再按调用方的投影去掉
+        strip_id = bool(projection) and projection.get("_id", 1) == 0
+        if strip_id:
+            projection = {k: v for k, v in projection.items() if k != "_id"} or None
+
+        items = list(self.db[collection].find(query, projection).sort(sort).limit(limit + 1))
+        next_after = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_after = encode_page_cursor(last.get(sort_field) if sort_field != "_id" else None, last["_id"])
+        if strip_id:
+            for item in items:
+                del item["_id"]
+        return items, next_after
 
     def get_last(self, collection, query=None):
         """
@@ -111,6 +304,15 @@ class MongoConnectClient:
     def delete_collection(self, collection):
         return self.db[collection].drop()
 
+    def create_index(self, collection, keys, **kwargs):
+        """
+        创建索引，索引已存在时 mongo 不会重复创建，可以在每次启动时调用
+        :param collection: collection名称
+        :param keys: 索引字段，如 [("namespace", 1), ("label", 1)]
+        :return: 索引名称
+        """
+        return self.db[collection].create_index(keys, **kwargs)
+
     def perform_transaction(self, user_func, *args):
         try:
             # 开启会话并在事务中执行操作
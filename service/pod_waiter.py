@@ -0,0 +1,190 @@
+"""
+    基于 watch 的 pod 就绪等待：每个 namespace 最多一个 pod watch 连接，同时等待的所有 pod 共用
+    没有等待中的 pod 时 watch 线程退出，下次等待时重新 LIST 再 watch
+"""
+import threading
+import time
+from concurrent.futures import Future, wait
+
+from kubernetes import watch
+from kubernetes.client import ApiException
+from loguru import logger
+
+from config.config import POD_WATCH_TIMEOUT_SECONDS
+
+
+def pod_state(pod) -> str:
+    """
+    :return: "ready"（Running 且所有容器就绪）、"failed"（已退出）、"deleting"（正在删除）或 "pending"
+    """
+    # 重启节点时旧 pod 可能还在 Terminating，不能当作新 pod 已就绪
+    if pod.metadata.deletion_timestamp is not None:
+        return "deleting"
+    status = pod.status
+    phase = status.phase if status else None
+    if phase in ("Failed", "Succeeded"):
+        return "failed"
+    container_statuses = status.container_statuses if status else None
+    if phase == "Running" and container_statuses and all(c.ready for c in container_statuses):
+        return "ready"
+    return "pending"
+
+
+class NamespacePodWatcher:
+    """
+    一个 namespace 下等待中的 pod，pod 名称 -> {"futures": [...], "uid": 等待期间看到的 pod uid}
+    """
+
+    def __init__(self, core_api, namespace: str):
+        self.core_api = core_api
+        self.namespace = namespace
+        self.waiters = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def register(self, pod_names: list) -> dict:
+        """
+        :return: pod 名称 -> Future，就绪时结果为 True，pod 退出或被删除时为 RuntimeError
+        """
+        futures = {}
+        with self.lock:
+            for name in pod_names:
+                future = Future()
+                self.waiters.setdefault(name, {"futures": [], "uid": None})["futures"].append(future)
+                futures[name] = future
+            started = self.thread is None
+            if started:
+                self.thread = threading.Thread(target=self.run, name=f"pod-watch-{self.namespace}", daemon=True)
+                self.thread.start()
+        # 新启动的线程会先 LIST；已有的 watch 只会推送之后的变化，这里 LIST 一次补上已经就绪的 pod
+        if not started:
+            self.resync()
+        return futures
+
+    def abandon(self, name: str, future: Future):
+        with self.lock:
+            entry = self.waiters.get(name)
+            if entry and future in entry["futures"]:
+                entry["futures"].remove(future)
+                if not entry["futures"]:
+                    self.waiters.pop(name)
+
+    def resync(self):
+        """
+        LIST 一次 namespace 下的 pod，处理所有等待中的 pod
+        :return: LIST 的 resourceVersion，作为 watch 的起点
+        """
+        resp = self.core_api.list_namespaced_pod(namespace=self.namespace)
+        for pod in resp.items:
+            self.resolve("ADDED", pod)
+        return resp.metadata.resource_version
+
+    def resolve(self, event_type: str, pod):
+        name = pod.metadata.name
+        state = pod_state(pod)
+        with self.lock:
+            entry = self.waiters.get(name)
+            if entry is None:
+                return
+            if event_type == "DELETED":
+                # 只有等待期间见过的那个 pod 被删除才算失败，重启时旧 pod 的删除事件忽略
+                if entry["uid"] is None or entry["uid"] != pod.metadata.uid:
+                    return
+                error = RuntimeError(f"Pod {name} was deleted while waiting")
+            elif state == "deleting":
+                return
+            elif state == "failed":
+                error = RuntimeError(f"Pod {name} exited with unexpected phase")
+            elif state == "ready":
+                error = None
+            else:
+                entry["uid"] = pod.metadata.uid
+                return
+            self.waiters.pop(name)
+        for future in entry["futures"]:
+            if error is None:
+                future.set_result(True)
+            else:
+                future.set_exception(error)
+
+    def idle(self) -> bool:
+        """
+        没有等待中的 pod 时登记线程退出并返回 True，与 register 在同一把锁下判断
+        """
+        with self.lock:
+            if self.waiters:
+                return False
+            self.thread = None
+            return True
+
+    def run(self):
+        resource_version = None
+        while not self.idle():
+            try:
+                if resource_version is None:
+                    resource_version = self.resync()
+                    continue
+                resource_version = self.watch_once(resource_version)
+            except ApiException as e:
+                if e.status != 410:
+                    logger.warning(f"pod watch in {self.namespace} failed: {e}")
+                    time.sleep(1)
+                resource_version = None
+            except Exception as e:
+                logger.warning(f"pod watch in {self.namespace} failed: {e}")
+                time.sleep(1)
+                resource_version = None
+
+    def watch_once(self, resource_version: str) -> str:
+        """
+        watch 到超时或没有等待中的 pod 为止
+        :return: 最后一个事件的 resourceVersion
+        """
+        w = watch.Watch()
+        for event in w.stream(self.core_api.list_namespaced_pod,
+                              namespace=self.namespace,
+                              resource_version=resource_version,
+                              timeout_seconds=POD_WATCH_TIMEOUT_SECONDS):
+            if event["type"] == "ERROR":
+                raw = event.get("raw_object") or {}
+                raise ApiException(status=raw.get("code", 500), reason=raw.get("message"))
+            pod = event["object"]
+            resource_version = pod.metadata.resource_version or resource_version
+            self.resolve(event["type"], pod)
+            with self.lock:
+                if not self.waiters:
+                    w.stop()
+                    break
+        return resource_version
+
+
+class PodReadinessWaiter:
+    """
+    按 namespace 懒加载 NamespacePodWatcher
+    """
+
+    def __init__(self, core_api):
+        self.core_api = core_api
+        self.watchers = {}
+        self.lock = threading.Lock()
+
+    def watcher(self, namespace: str) -> NamespacePodWatcher:
+        with self.lock:
+            if namespace not in self.watchers:
+                self.watchers[namespace] = NamespacePodWatcher(self.core_api, namespace)
+            return self.watchers[namespace]
+
+    def wait_ready(self, namespace: str, pod_names: list, timeout: float) -> dict:
+        """
+        等待多个 pod 就绪
+        :param timeout: 所有 pod 共用的超时时间（秒）
+        :return: pod 名称 -> 是否在超时前就绪
+        :raise RuntimeError: 有 pod 退出或在等待期间被删除
+        """
+        watcher = self.watcher(namespace)
+        futures = watcher.register(pod_names)
+        wait(futures.values(), timeout=timeout)
+        for name, future in futures.items():
+            if not future.done():
+                watcher.abandon(name, future)
+        return {name: future.done() and future.result() for name, future in futures.items()}
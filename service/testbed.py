@@ -6,6 +6,7 @@ from bson import ObjectId
 from config.config import mongo_client_platform_meta, mongo_client_pure_data, mongo_client_vn_chaos
 from service.k8s import *
 from service.file import read_yaml
+from service.mongo import list_projection
 
 # 2.操作mongo对象，完成插入。
 def store_vn_chaos(namespace:str,fault_name:str,target_pod:str,field:str,inject_time:str):
@@ -67,19 +68,14 @@ def store_user_vn_testbed(email: str, namespace: str, benchmark_email: str, benc
 
 
 def get_user_testbed(email: str):
-    records = mongo_client_platform_meta.get_all(collection="testbed", query={"email": email})
-    raw = list(records)
-    for item in raw:
-        del item["_id"]
-    return raw
+    records = mongo_client_platform_meta.get_all(collection="testbed", query={"email": email},
+                                                 projection=list_projection())
+    return list(records)
 
 def list_llm_context(namespace: str):
     collection = "topology_llm_context_" + namespace
-    records = mongo_client_pure_data.get_all(collection=collection, query={})
-    raw = list(records)
-    for item in raw:
-        del item["_id"]
-    return raw
+    records = mongo_client_pure_data.get_all(collection=collection, query={}, projection=list_projection())
+    return list(records)
 
 def store_llm_context(namespace: str, role: str, content: str):
     collection = "topology_llm_context_" + namespace
@@ -135,40 +131,30 @@ def create_benchmark(email: str, name: str, visibility: str, description: str, h
 
 
 def benchmark_exists(email: str, name: str) -> bool:
-    records = mongo_client_platform_meta.get_all(collection="benchmark", query={
+    record = mongo_client_platform_meta.get_one(collection="benchmark", query={
         "email": email,
         "name": name
     })
-    raw = list(records)
-    if len(raw) == 0:
-        return False
-    else:
-        return True
+    return record is not None
 
 
 def get_public_benchmarks():
-    records = mongo_client_platform_meta.get_all(collection="benchmark", query={"visibility": "public"})
-    raw = list(records)
-    for item in raw:
-        del item["_id"]
-    return raw
+    records = mongo_client_platform_meta.get_all(collection="benchmark", query={"visibility": "public"},
+                                                 projection=list_projection())
+    return list(records)
 
 
 def get_private_benchmarks(email: str):
     records = mongo_client_platform_meta.get_all(collection="benchmark",
-                                                 query={"email": email, "visibility": "private"})
-    raw = list(records)
-    for item in raw:
-        del item["_id"]
-    return raw
+                                                 query={"email": email, "visibility": "private"},
+                                                 projection=list_projection())
+    return list(records)
 
 
 def get_benchmarks_by_email(email: str):
-    records = mongo_client_platform_meta.get_all(collection="benchmark", query={"email": email})
-    raw = list(records)
-    for item in raw:
-        del item["_id"]
-    return raw
+    records = mongo_client_platform_meta.get_all(collection="benchmark", query={"email": email},
+                                                 projection=list_projection())
+    return list(records)
 
 
 def store_benchmark_file(email: str, benchmark_name: str, file: dict):
@@ -179,13 +165,11 @@ def store_benchmark_file(email: str, benchmark_name: str, file: dict):
     return resp
 
 
-def get_benchmark_files(email: str, benchmark_name: str):
+def get_benchmark_files(email: str, benchmark_name: str, with_content: bool = False):
     records = mongo_client_platform_meta.get_all(collection="benchmark-files",
-                                                 query={"email": email, "benchmarkName": benchmark_name})
-    raw = list(records)
-    for item in raw:
-        del item["_id"]
-    return raw
+                                                 query={"email": email, "benchmarkName": benchmark_name},
+                                                 projection=list_projection("fileContent", include_large=with_content))
+    return list(records)
 
 
 def get_benchmark_file(email: str, benchmark_name: str, dir_path: str, file_name: str):
@@ -315,16 +299,13 @@ def replace_benchmark_files(email: str, benchmark: str, files: list):
         store_benchmark_file(email, benchmark, file)
 
 
-def get_benchmark_files_under_dir(email: str, benchmark: str, dir: str):
+def get_benchmark_files_under_dir(email: str, benchmark: str, dir: str, with_content: bool = False):
     records = mongo_client_platform_meta.get_all(collection="benchmark-files", query={
         "email": email,
         "benchmarkName": benchmark,
         "dirPath": dir
-    })
-    raw = list(records)
-    for item in raw:
-        del item["_id"]
-    return raw
+    }, projection=list_projection("fileContent", include_large=with_content))
+    return list(records)
 
 
 def deploy_crawler(testbed: str) -> (bool, str):
@@ -3,13 +3,16 @@ import uuid
 import yaml
 import os
 from .k8s import *
-from collections import deque
+from .topology_graph import TopologyGraph
 from kubernetes import client, config
 from kubernetes.stream import stream
 from flask import Blueprint, request, make_response, jsonify
 from loguru import logger
 
-from config.config import ignore_ns, custom_object_dict
+from config.config import ignore_ns, custom_object_dict, INTERFACE_WAIT_TIMEOUT_SECONDS, \
+    OVS_PORT_WAIT_TIMEOUT_SECONDS, TOPOLOGY_WAIT_TIMEOUT_SECONDS
+from util.latency import timed
+from util.wait import wait_for
 
 try:
     config.load_kube_config()  # used when have kubeconfig file locally
@@ -19,38 +22,63 @@ except Exception as e:
 
 
 def get_next_avaliable_pod_name(node_kind: str, topology_docs: list):
-    node_kind_st = ""
-    index = 0
-    if node_kind == "host":
-        node_kind_st = "host"
-        index = 4
+    return TopologyGraph(topology_docs).next_pod_name(node_kind)
 
-    elif node_kind == "switch":
-        node_kind_st = "sw"
-        index = 2
 
-    elif node_kind == "firewall":
-        node_kind_st = "fw"
-        index = 2
+def interface_exists(pod: str, namespace: str, interface: str) -> bool:
+    """
+    接口是否已经出现在 pod 的网络命名空间中
+    """
+    try:
+        resp = stream(v1.connect_get_namespaced_pod_exec,
+                        pod,
+                        namespace,
+                        container="pod",
+                        command=["ip", "link", "show", interface],
+                        stderr=True, stdin=False,
+                        stdout=True, tty=False)
+    except Exception as e:
+        logger.warning(f"Error checking interface {interface} in {pod}: {str(e)}")
+        return False
+    # iproute2 输出 Device "x" does not exist.，busybox 输出 ip: can't find device 'x'
+    return bool(resp) and not resp.startswith("ip") and "does not exist" not in resp
 
-    elif node_kind == "router":
-        node_kind_st = "r"
-        index = 1
 
-    existing_pods = set()
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'].startswith(node_kind_st):
-            try:
-                pod_num = int(doc['metadata']['name'][index:])
-                existing_pods.add(pod_num)
-            except ValueError:
-                continue
-    
-    pod_id = 1
-    while pod_id in existing_pods:
-        pod_id += 1
-    
-    return node_kind_st + str(pod_id)
+def ovs_port_listed(switch_pod: str, namespace: str, switch_interface: str) -> bool:
+    try:
+        resp = stream(v1.connect_get_namespaced_pod_exec,
+                        switch_pod,
+                        namespace,
+                        command=["ovs-vsctl", "list-ports", "br0"],
+                        stderr=True, stdin=False,
+                        stdout=True, tty=False)
+    except Exception as e:
+        logger.warning(f"Error listing OVS ports of {switch_pod}: {str(e)}")
+        return False
+    return switch_interface in resp.split()
+
+
+def topology_node_names(namespace: str) -> set:
+    return {doc['metadata']['name'] for doc in load_topology_yaml(namespace=namespace)["items"]}
+
+
+def wait_topology_node_added(namespace: str, before: set):
+    """
+    等待缓存中出现 before 之外的新节点，即上一个添加操作已经写入了 Topology，
+    之后的操作再读取快照分配名称、uid 和 ip 时不会重复
+    """
+    return wait_for(lambda: topology_node_names(namespace) - before, timeout=TOPOLOGY_WAIT_TIMEOUT_SECONDS,
+                    name="topology_add")
+
+
+def wait_topology_node_detached(namespace: str, name: str):
+    """
+    等待缓存中节点本身以及所有指向它的 link 都被删除，即上一个删除操作对对端 links 的修改已经写入
+    """
+    def detached():
+        graph = TopologyGraph(load_topology_yaml(namespace=namespace))
+        return not graph.has_node(name) and all(name not in graph.neighbors(node) for node in graph.docs)
+    return wait_for(detached, timeout=TOPOLOGY_WAIT_TIMEOUT_SECONDS, name="topology_detach")
 
 
 def delete_peer_host_or_firewall_or_router_interface(pod: str, namespace: str, interface: str):
@@ -88,7 +116,10 @@ def delete_peer_switch_ovs_br0_interface(switch_pod: str, namespace: str, switch
 
 
 def add_peer_firewall_br0_interface(firewall_pod: str, namespace: str, interface: str):
-    time.sleep(3)  # 防止veth_pair的一端接口还没绑定到pod的网络命名空间，就将该端口绑到br0上
+    # 防止veth_pair的一端接口还没绑定到pod的网络命名空间，就将该端口绑到br0上
+    if not wait_for(lambda: interface_exists(firewall_pod, namespace, interface),
+                    timeout=INTERFACE_WAIT_TIMEOUT_SECONDS, name="interface"):
+        logger.warning(f"interface {interface} does not exist in {firewall_pod}, adding it to br0 anyway")
     add_cmd = ["brctl", "addif", "br0", interface]
     try:
         resp = stream(
@@ -110,13 +141,15 @@ def add_peer_firewall_br0_interface(firewall_pod: str, namespace: str, interface
 
 
 def add_peer_switch_ovs_br0_interface(switch_pod: str, namespace: str, switch_interface: str):
-    check_cmd = ["ovs-vsctl", "list-ports", "br0"]
     add_cmd = ["ovs-vsctl", "add-port", "br0", switch_interface]
-    max_retries = 5
 
-    for attempt in range(1, max_retries + 1):
+    if not wait_for(lambda: interface_exists(switch_pod, namespace, switch_interface),
+                    timeout=INTERFACE_WAIT_TIMEOUT_SECONDS, name="interface"):
+        logger.warning(f"interface {switch_interface} does not exist in {switch_pod}, adding it to br0 anyway")
+
+    def port_added():
         try:
-            logger.info(f"Attempt {attempt}/{max_retries}: Adding {switch_interface} to br0")
+            logger.info(f"Adding {switch_interface} to br0 of {switch_pod}")
             resp = stream(
                 v1.connect_get_namespaced_pod_exec,
                 switch_pod,
@@ -129,67 +162,23 @@ def add_peer_switch_ovs_br0_interface(switch_pod: str, namespace: str, switch_in
                 tty=False
             )
             logger.debug(f"Add port response: {resp}")
-
-            # 检查端口是否实际存在
-            for _ in range(3):
-                check_resp = stream(
-                    v1.connect_get_namespaced_pod_exec,
-                    switch_pod,
-                    namespace,
-                    command=check_cmd,
-                    stderr=True,
-                    stdin=False,
-                    stdout=True,
-                    tty=False
-                )
-                if switch_interface in check_resp:
-                    logger.info(f"Interface {switch_interface} successfully added to br0")
-                    return True
-                time.sleep(1)
-
-            logger.warning(f"Interface {switch_interface} not found in br0 after add command")
-
         except Exception as e:
-            logger.warning(f"Attempt {attempt} failed: {str(e)}")
-            if attempt == max_retries:
-                raise RuntimeError(f"Failed to add interface {switch_interface} to br0 after {max_retries} attempts") from e
-
-        sleep_time = min(2 ** (attempt // 2), 30)
-        logger.info(f"Retrying in {sleep_time} seconds...")
-        time.sleep(sleep_time)
+            logger.warning(f"Adding {switch_interface} to br0 failed: {str(e)}")
+            return False
+        # 检查端口是否实际存在
+        return ovs_port_listed(switch_pod, namespace, switch_interface)
 
-    raise RuntimeError(f"Failed to verify interface {switch_interface} in br0 after {max_retries} attempts")
+    if wait_for(port_added, timeout=OVS_PORT_WAIT_TIMEOUT_SECONDS, initial_interval=0.5, max_interval=8,
+                name="ovs_port"):
+        logger.info(f"Interface {switch_interface} successfully added to br0")
+        return True
+    raise RuntimeError(f"Failed to verify interface {switch_interface} in br0 after {OVS_PORT_WAIT_TIMEOUT_SECONDS}s")
 
 
 def add_default_route_ip_for_host(namespace: str, pod_name: str, swname: str, default_route_ip: str):
     # 先判断host里接口是否存在
-    timeout = 30
-    start_time = time.time()
-    exist = False
-    while time.time() - start_time < timeout:
-        try:
-            check_cmd = ["ip", "link", "show", f"{pod_name}_{swname}"]
-            resp = stream(
-                v1.connect_get_namespaced_pod_exec,
-                pod_name,
-                namespace,
-                container="pod",
-                command=check_cmd,
-                stderr=True,
-                stdin=False,
-                stdout=True,
-                tty=False
-            )
-
-            if resp.startswith("ip"):
-                time.sleep(1)
-                logger.warning(f"interface {pod_name}_{swname} does not exist, continue checking...")
-            else:
-                exist = True
-                break
-        except Exception as e:
-            print(f"Error checking interface: {e}")
-            time.sleep(1)
+    exist = wait_for(lambda: interface_exists(pod_name, namespace, f"{pod_name}_{swname}"),
+                     timeout=INTERFACE_WAIT_TIMEOUT_SECONDS, name="interface")
     
     if exist == False:
         logger.warning(f"interface {pod_name}_{swname} does not exist")
@@ -226,122 +215,25 @@ def add_default_route_ip_for_host(namespace: str, pod_name: str, swname: str, de
 
 
 def get_next_avaliable_uid(topology_docs: dict):
-    existing_uids = []
-    for doc in topology_docs["items"]:
-        for link in doc['spec']['links']:
-            existing_uids.append(link['uid'])
-    
-    uid = 1
-    while uid in existing_uids:
-        uid += 1
-
-    return uid
+    return TopologyGraph(topology_docs).next_uid()
 
 
 def get_next_avaliable_subnet_id(topology_docs: dict):
-    existing_subnet_id = []
-
-    for doc in topology_docs["items"]:
-        if doc['metadata']['name'].startswith('r') or doc['metadata']['name'].startswith('sw'):
-            for link in doc['spec']['links']:
-                if "local_ip" in link.keys():
-                    if link["local_ip"]:
-                        subnet_id = int(link["local_ip"].split('.')[2])
-                        if subnet_id not in existing_subnet_id:
-                            existing_subnet_id.append(subnet_id)
-                if "peer_ip" in link.keys():
-                    if link["peer_ip"]:
-                        subnet_id = int(link["peer_ip"].split('.')[2])
-                        if subnet_id not in existing_subnet_id:
-                            existing_subnet_id.append(subnet_id)
-    
     # 获取最小未使用子网号
-    id = 1
-    while id in existing_subnet_id:
-        id += 1
-
-    return id
+    return TopologyGraph(topology_docs).next_subnet_id()
 
 
 # 获取默认路由
 def find_router_ip(topology_docs: list, start_switch: str):
-    visited = set()
-    queue = deque()
-    queue.append(start_switch)
-    
-    while queue:
-        current = queue.popleft()
-        visited.add(current)
-        
-        # Find the topology doc for current node
-        current_doc = None
-        for doc in topology_docs["items"]:
-            if doc['kind'] == 'Topology' and doc['metadata']['name'] == current:
-                current_doc = doc
-                break
-        
-        if not current_doc:
-            continue
-            
-        if current.startswith('r'):
-            for link in current_doc['spec']['links']:
-                if 'local_ip' in link and link['peer_pod'] in visited:
-                    return link['local_ip'].split('/')[0]
-
-            return None
-        
-        # If not a router, add all connected nodes to queue
-        for link in current_doc['spec']['links']:
-            peer = link['peer_pod']
-            if peer not in visited:
-                queue.append(peer)
-    
-    return None
+    return TopologyGraph(topology_docs).find_router_ip(start_switch)
 
 
-# 获取子网内所有已使用的主机号
+# 获取子网内最小的未使用主机号
 def get_next_avaliable_host_number_in_subnet(topology_docs: list, start_switch: str, target_subnet: str):
-    visited = set()
-    queue = deque()
-    queue.append(start_switch)
-    host_ips = set()
-    
-    while queue:
-        current = queue.popleft()
-        visited.add(current)
-        
-        current_doc = None
-        for doc in topology_docs["items"]:
-            if doc['kind'] == 'Topology' and doc['metadata']['name'] == current:
-                current_doc = doc
-                break
-        
-        if not current_doc:
-            continue
-            
-        # Check all links for IPs in target subnet
-        for link in current_doc['spec'].get('links', []):
-            if 'local_ip' in link:
-                ip = link['local_ip'].split('/')[0]
-                if ip.startswith(target_subnet + '.'):
-                    host_ips.add(int(ip.split('.')[-1]))
-            
-            if 'peer_ip' in link:
-                ip = link['peer_ip'].split('/')[0]
-                if ip.startswith(target_subnet + '.'):
-                    host_ips.add(int(ip.split('.')[-1]))
-            
-            peer = link['peer_pod']
-            if peer not in visited and (peer.startswith('sw') or peer.startswith('fw')):
-                queue.append(peer)
-    
-    host_number = 1
-    while host_number in host_ips:
-        host_number += 1
-
-    return host_number
+    return TopologyGraph(topology_docs).next_host_number(target_subnet)
 
 
+@timed("topology.add_connection")
 def add_connection(namespace: str, pod1: str, pod2: str):
     logger.info(f"pod1: {pod1}, pod2: {pod2}")
     # 禁止向路由器-主机、主机-主机、防火墙-主机间添加连接
@@ -349,17 +241,11 @@ def add_connection(namespace: str, pod1: str, pod2: str):
         return False
     
     topology_docs = load_topology_yaml(namespace=namespace)
-    new_uid = get_next_avaliable_uid(topology_docs=topology_docs)
+    graph = TopologyGraph(topology_docs)
+    new_uid = graph.next_uid()
     logger.info(f"Next avaliable uid: {new_uid}")
-    pod1_doc = None
-    pod2_doc = None
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == pod1:
-            pod1_doc = doc
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == pod2:
-            pod2_doc = doc
-        if pod1_doc != None and pod2_doc != None:
-            break
+    pod1_doc = graph.doc(pod1)
+    pod2_doc = graph.doc(pod2)
 
     pod1_dict = {
         'uid': new_uid,
@@ -384,14 +270,14 @@ def add_connection(namespace: str, pod1: str, pod2: str):
             start_switch = pod2 
         else:
             start_switch = pod1
-        default_route = find_router_ip(topology_docs=topology_docs, start_switch=start_switch)
+        default_route = graph.find_router_ip(start_switch)
         logger.info(f"Default_route: {default_route}")
         if not default_route:  # 此时即将与该host相连的sw不存在到路由器的路径，找不到默认路由
             return False
         
         subnet = '.'.join(default_route.split('.')[:3])
 
-        host_part = get_next_avaliable_host_number_in_subnet(topology_docs=topology_docs, start_switch=start_switch, target_subnet=subnet)
+        host_part = graph.next_host_number(subnet)
         host_ip = f"{subnet}.{host_part}/24"
         logger.info(f"Host_ip: {host_ip}")
         if pod1.startswith('host'):
@@ -437,11 +323,10 @@ def add_connection(namespace: str, pod1: str, pod2: str):
     pod2_doc['spec']['links'].append(pod2_dict)
     update_topology_item_link(namespace=namespace, topology=pod1_doc, name=pod1_doc['metadata']['name'])
     update_topology_item_link(namespace=namespace, topology=pod2_doc, name=pod2_doc['metadata']['name'])
-    time.sleep(1)
     logger.info("Topology items update complete.")
     
+    # 之后配置接口的函数都会先等待接口出现在 pod 中
     add_connection_service(PodName1=pod1, IfName1=f"{pod1}_{pod2}", Ip1=pod1_dict['local_ip'], PodName2=pod2, IfName2=f"{pod2}_{pod1}", Ip2=pod2_dict['local_ip'], Namespace=namespace)
-    time.sleep(3)
 
     if pod1.startswith('sw'):
         add_peer_switch_ovs_br0_interface(switch_pod=pod1, namespace=namespace, switch_interface=pod1_dict['local_intf'])
@@ -459,6 +344,7 @@ def add_connection(namespace: str, pod1: str, pod2: str):
     return True
 
 
+@timed("topology.delete_connection")
 def delete_connection(namespace: str, pod1: str, pod2: str):
     pod1_interface = f"{pod1}_{pod2}"
     pod2_interface = f"{pod2}_{pod1}"
@@ -467,7 +353,8 @@ def delete_connection(namespace: str, pod1: str, pod2: str):
     else:
         delete_peer_host_or_firewall_or_router_interface(pod=pod1, namespace=namespace, interface=pod1_interface)
     
-    time.sleep(1)
+    wait_for(lambda: not interface_exists(pod1, namespace, pod1_interface), timeout=INTERFACE_WAIT_TIMEOUT_SECONDS,
+             name="interface_delete")
 
     if pod2.startswith("sw"):
         delete_peer_switch_ovs_br0_interface(switch_pod=pod2, namespace=namespace, switch_interface=pod2_interface)
@@ -486,32 +373,32 @@ def delete_connection(namespace: str, pod1: str, pod2: str):
     return True
 
 
+@timed("topology.add_host")
 def add_host(namespace: str, switchname: str,hostname: str=None):
     topology_docs = load_topology_yaml(namespace=namespace)
+    graph = TopologyGraph(topology_docs)
     if not hostname:
-        hostname = get_next_avaliable_pod_name(node_kind="host", topology_docs=topology_docs)
-    default_route = find_router_ip(topology_docs=topology_docs, start_switch=switchname)
+        hostname = graph.next_pod_name("host")
+    default_route = graph.find_router_ip(switchname)
     if not default_route:
         raise ValueError(f"Could not find a router connected to switch {switchname}")
 
     subnet = '.'.join(default_route.split('.')[:3])
-    host_part = get_next_avaliable_host_number_in_subnet(topology_docs=topology_docs, start_switch=switchname, target_subnet=subnet)
+    host_part = graph.next_host_number(subnet)
     host_ip = f"{subnet}.{host_part}/24"
     
     host_pod_yaml = generate_host_pod_yaml(hostname=hostname, default_route=default_route)
-    new_uid = get_next_avaliable_uid(topology_docs=topology_docs)
+    new_uid = graph.next_uid()
 
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == switchname:
-            doc['spec']['links'].append({
-                'uid': new_uid,
-                'peer_pod': hostname,
-                'local_intf': f"{switchname}_{hostname}",
-                'peer_intf': f"{hostname}_{switchname}",
-                'peer_ip': host_ip
-            })
-            update_topology_item_link(namespace=namespace, topology=doc, name=switchname)
-            break
+    switch_doc = graph.doc(switchname)
+    switch_doc['spec']['links'].append({
+        'uid': new_uid,
+        'peer_pod': hostname,
+        'local_intf': f"{switchname}_{hostname}",
+        'peer_intf': f"{hostname}_{switchname}",
+        'peer_ip': host_ip
+    })
+    update_topology_item_link(namespace=namespace, topology=switch_doc, name=switchname)
     
     host_doc = {
         'apiVersion': 'networkop.co.uk/v1beta1',
@@ -540,12 +427,12 @@ def add_host(namespace: str, switchname: str,hostname: str=None):
         return None
 
 
+@timed("topology.delete_host")
 def delete_host(namespace: str, hostname: str):
     logger.info(f"deleting pod {hostname}")
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace)
     delete_topology_item(namespace=namespace, name=hostname)
-    time.sleep(1)
     
     for doc in topology_docs["items"]:
         if doc['kind'] == 'Topology' and doc['metadata']['name'].startswith('sw'):          
@@ -562,21 +449,22 @@ def delete_host(namespace: str, hostname: str):
         return False
 
 
+@timed("topology.add_switch_for_switch")
 def add_switch_for_switch(namespace: str, oldswitchname: str):
     topology_docs = load_topology_yaml(namespace=namespace)
-    swname = get_next_avaliable_pod_name("switch", topology_docs=topology_docs)
-    new_uid = get_next_avaliable_uid(topology_docs=topology_docs)
-
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == oldswitchname:
-            doc['spec']['links'].append({
-                'uid': new_uid,
-                'peer_pod': swname,
-                'local_intf': f"{oldswitchname}_{swname}",
-                'peer_intf': f"{swname}_{oldswitchname}"
-            })
-            update_topology_item_link(namespace=namespace, topology=doc, name=oldswitchname)
-            break
+    graph = TopologyGraph(topology_docs)
+    swname = graph.next_pod_name("switch")
+    new_uid = graph.next_uid()
+
+    old_switch_doc = graph.doc(oldswitchname)
+    if old_switch_doc is not None:
+        old_switch_doc['spec']['links'].append({
+            'uid': new_uid,
+            'peer_pod': swname,
+            'local_intf': f"{oldswitchname}_{swname}",
+            'peer_intf': f"{swname}_{oldswitchname}"
+        })
+        update_topology_item_link(namespace=namespace, topology=old_switch_doc, name=oldswitchname)
     
     new_switch_doc = {
         'apiVersion': 'networkop.co.uk/v1beta1',
@@ -606,16 +494,14 @@ def add_switch_for_switch(namespace: str, oldswitchname: str):
         return None
 
 
+@timed("topology.add_switch_for_firewall")
 def add_switch_for_firewall(namespace: str, firewallname: str):
     topology_docs = load_topology_yaml(namespace=namespace)
-    swname = get_next_avaliable_pod_name("switch", topology_docs=topology_docs)
-    firwall_doc = None
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == firewallname:
-            firwall_doc = doc
-            break
+    graph = TopologyGraph(topology_docs)
+    swname = graph.next_pod_name("switch")
+    firwall_doc = graph.doc(firewallname)
 
-    new_uid = get_next_avaliable_uid(topology_docs=topology_docs)
+    new_uid = graph.next_uid()
     firwall_doc['spec']['links'].append({
         'uid': new_uid,
         'peer_pod': swname,
@@ -652,19 +538,17 @@ def add_switch_for_firewall(namespace: str, firewallname: str):
         return None
 
 
+@timed("topology.add_switch_for_router")
 def add_switch_for_router(namespace: str, routername: str,swname=""):
     topology_docs = load_topology_yaml(namespace=namespace)
+    graph = TopologyGraph(topology_docs)
     if not swname:
-        swname = get_next_avaliable_pod_name("switch", topology_docs=topology_docs)
+        swname = graph.next_pod_name("switch")
     
-    route_doc = None
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == routername:
-            route_doc = doc
-            break
+    route_doc = graph.doc(routername)
     
-    new_uid = get_next_avaliable_uid(topology_docs=topology_docs)
-    subnet_id = get_next_avaliable_subnet_id(topology_docs=topology_docs)
+    new_uid = graph.next_uid()
+    subnet_id = graph.next_subnet_id()
     r_ip = f"10.12.{subnet_id}.1/24"
 
     route_doc['spec']['links'].append({
@@ -705,6 +589,7 @@ def add_switch_for_router(namespace: str, routername: str,swname=""):
         return None
     
 
+@timed("topology.reboot_switch")
 def reboot_switch(namespace: str, switchname: str):
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace)
@@ -753,7 +638,7 @@ def reboot_switch(namespace: str, switchname: str):
     sw_pod_running = check_pod_running(namespace=namespace, pod_name=switchname) 
     
     if sw_pod_running:
-        time.sleep(3)
+        # 配置主机路由和 OVS 端口的函数会先等待接口出现在 pod 中
         for pod_name, interface_name in peer_pod_interfaces.items():
             if pod_name.startswith("host"):
                 add_default_route_ip_for_host(namespace=namespace, pod_name=pod_name, swname=switchname, default_route_ip=default_ip[pod_name])
@@ -785,12 +670,12 @@ def reboot_switch_ovs_service(namespace: str, switchname: str):
     return True
 
 
+@timed("topology.delete_switch")
 def delete_switch(namespace: str, switchname: str):
     logger.info(f"deleting pod {switchname}")
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace)
     delete_topology_item(namespace=namespace, name=switchname)
-    time.sleep(1)
 
     for doc in topology_docs["items"]:
         for link in doc['spec']['links']:
@@ -809,6 +694,7 @@ def delete_switch(namespace: str, switchname: str):
         return False
 
 # 创建单个路由
+@timed("topology.add_single")
 def add_single(namespace: str, routernames: str,switchnames:str,hostnames:str):
     if routernames:
         routernames=routernames.split(",")
@@ -846,7 +732,8 @@ def add_single(namespace: str, routernames: str,switchnames:str,hostnames:str):
         switchnames = switchnames.split(",")
         for switchname in switchnames:
             add_switch_for_router(namespace,routername,switchname)
-        time.sleep(7)
+        wait_for(lambda: all(interface_exists(switchname, namespace, f"{switchname}_{routername}") for switchname in switchnames),
+                 timeout=INTERFACE_WAIT_TIMEOUT_SECONDS, name="interface")
         for switchname in switchnames:
             delete_connection(namespace,routername,switchname)
 
@@ -855,7 +742,8 @@ def add_single(namespace: str, routernames: str,switchnames:str,hostnames:str):
         hostnames = hostnames.split(",")
         for hostname in hostnames:
             add_host(namespace,switchname,hostname)
-        time.sleep(7)
+        wait_for(lambda: all(interface_exists(hostname, namespace, f"{hostname}_{switchname}") for hostname in hostnames),
+                 timeout=INTERFACE_WAIT_TIMEOUT_SECONDS, name="interface")
         for hostname in hostnames:
             try:
                 delete_connection(namespace,switchname,hostname)
@@ -893,13 +781,15 @@ def create_switch_links(namespace:str,ss:str,sh:str):
                 return f"Error adding connection to switch:{sourceId} with host:{targetId}"
     return "True"
 # 添加路由（命名空间，已存在路由）
+@timed("topology.add_router")
 def add_router(namespace: str, oldroutername: str):
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace) # 加载拓扑文件
 
-    new_uid = get_next_avaliable_uid(topology_docs=topology_docs) # 获取 link 的 uid？
-    new_subnet_id = get_next_avaliable_subnet_id(topology_docs=topology_docs) # 获取可用子网的id
-    new_routername = get_next_avaliable_pod_name(node_kind="router", topology_docs=topology_docs) # 获取下一个可用路由器的名称
+    graph = TopologyGraph(topology_docs)
+    new_uid = graph.next_uid() # 获取 link 的 uid？
+    new_subnet_id = graph.next_subnet_id() # 获取可用子网的id
+    new_routername = graph.next_pod_name("router") # 获取下一个可用路由器的名称
 
     # 生成新子网+两端路由接口的ip
     subnet_prefix = f"10.12.{new_subnet_id}"
@@ -912,19 +802,18 @@ def add_router(namespace: str, oldroutername: str):
     new_r_pod_yaml = generate_router_pod_yaml(routername=new_routername) # 生成新路由器Pod的yaml
 
     # 更新旧路由器的拓扑连接
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == oldroutername: #找到旧路由器
-            doc['spec']['links'].append({
-                'uid': new_uid,
-                'peer_pod': new_routername,
-                'local_intf': interface_name,
-                'peer_intf': peer_interface_name,
-                'local_ip': old_router_ip,
-                'peer_ip': new_router_ip
-            })
-            # 更新
-            update_topology_item_link(namespace=namespace, topology=doc, name=oldroutername)
-            break
+    old_router_doc = graph.doc(oldroutername)
+    if old_router_doc is not None:
+        old_router_doc['spec']['links'].append({
+            'uid': new_uid,
+            'peer_pod': new_routername,
+            'local_intf': interface_name,
+            'peer_intf': peer_interface_name,
+            'local_ip': old_router_ip,
+            'peer_ip': new_router_ip
+        })
+        # 更新
+        update_topology_item_link(namespace=namespace, topology=old_router_doc, name=oldroutername)
 
     new_router_topology = {
         'apiVersion': 'networkop.co.uk/v1beta1',
@@ -952,12 +841,12 @@ def add_router(namespace: str, oldroutername: str):
     return None
 
 
+@timed("topology.delete_firewall")
 def delete_firewall(namespace: str, firewallname: str):
     logger.info(f"deleting pod {firewallname}")
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace)
     delete_topology_item(namespace=namespace, name=firewallname)
-    time.sleep(1)
 
     for doc in topology_docs["items"]:
         for link in doc['spec']['links']:
@@ -976,19 +865,17 @@ def delete_firewall(namespace: str, firewallname: str):
         return False
 
 
+@timed("topology.add_firewall_for_router")
 def add_firewall_for_router(namespace, routername):
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace)
+    graph = TopologyGraph(topology_docs)
 
-    route_doc = None
-    for doc in topology_docs["items"]:
-        if doc['kind'] == 'Topology' and doc['metadata']['name'] == routername:
-            route_doc = doc
-            break
+    route_doc = graph.doc(routername)
 
-    new_uid = get_next_avaliable_uid(topology_docs=topology_docs)
-    new_firewallname = get_next_avaliable_pod_name(node_kind="firewall", topology_docs=topology_docs)
-    subnet_id = get_next_avaliable_subnet_id(topology_docs=topology_docs)
+    new_uid = graph.next_uid()
+    new_firewallname = graph.next_pod_name("firewall")
+    subnet_id = graph.next_subnet_id()
     r_ip = f"10.12.{subnet_id}.1/24"
 
     route_doc['spec']['links'].append({
@@ -1028,6 +915,7 @@ def add_firewall_for_router(namespace, routername):
         return None
     
 
+@timed("topology.reboot_router")
 def reboot_router(namespace: str, routername: str):
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace)
@@ -1060,7 +948,7 @@ def reboot_router(namespace: str, routername: str):
     r_pod_running = check_pod_running(namespace=namespace, pod_name=routername) 
     
     if r_pod_running:
-        time.sleep(3)
+        # add_peer_switch_ovs_br0_interface 会先等待接口出现在交换机中
         for pod_name, interface_name in peer_pod_interfaces.items():
             if pod_name.startswith("sw"):
                 add_peer_switch_ovs_br0_interface(switch_pod=pod_name, namespace=namespace, switch_interface=peer_pod_interfaces[pod_name])
@@ -1069,12 +957,12 @@ def reboot_router(namespace: str, routername: str):
     return True
 
 
+@timed("topology.delete_router")
 def delete_router(namespace: str, routername: str):
     logger.info(f"deleting pod {routername}")
     load_config()
     topology_docs = load_topology_yaml(namespace=namespace)
     delete_topology_item(namespace=namespace, name=routername)
-    time.sleep(1)
 
     for doc in topology_docs["items"]:
         for link in doc['spec']['links']:
@@ -0,0 +1,337 @@
+"""
+    拓扑批量修改：在同一个快照上规划所有操作的名称、uid 和 ip，每个被修改的已有 Topology 只 PATCH 一次，
+    新节点的 pod 并行创建并统一等待就绪，创建阶段任何一步失败都会回滚已经做出的修改
+    操作格式：
+        {"op": "add", "kind": "host", "peer": "sw1", "name": "host9"}   # name 可省略，自动分配
+        {"op": "delete", "name": "host3"}
+"""
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+from kubernetes.client import ApiException
+from loguru import logger
+
+from config.config import TOPOLOGY_BATCH_CONCURRENCY
+from service.k8s import load_topology_yaml, add_topology_item, update_topology_item_link, delete_topology_item, \
+    add_pod, delete_pod, wait_pods_running, generate_host_pod_yaml, generate_switch_pod_yaml, \
+    generate_firewall_pod_yaml, generate_router_pod_yaml
+from service.topology import add_peer_switch_ovs_br0_interface, add_peer_firewall_br0_interface, \
+    delete_peer_switch_ovs_br0_interface, delete_peer_host_or_firewall_or_router_interface
+from service.topology_graph import TopologyGraph, NODE_NAME_PREFIX
+from util.latency import timed
+
+# 允许的 (新节点类型, 对端节点类型)，与 add_host / add_switch_for_* / add_router / add_firewall_for_router 对应
+SUPPORTED_ADDS = {
+    ("host", "switch"),
+    ("switch", "switch"),
+    ("switch", "firewall"),
+    ("switch", "router"),
+    ("router", "router"),
+    ("firewall", "router"),
+}
+
+
+class BatchPlanError(ValueError):
+    """
+    操作不合法，没有对集群做任何修改
+    """
+
+
+class BatchConflictError(RuntimeError):
+    """
+    规划之后拓扑被其他请求修改，已回滚，可以重试
+    """
+
+
+def node_kind_of(name: str):
+    # "r" 是其他前缀的子串，放在最后判断
+    for kind in ("host", "switch", "firewall", "router"):
+        if name.startswith(NODE_NAME_PREFIX[kind]):
+            return kind
+    return None
+
+
+class TopologyBatchPlan:
+    """
+    plan_batch 的结果，execute_plan 按这里的内容依次修改集群
+    """
+
+    def __init__(self, graph: TopologyGraph):
+        self.graph = graph
+        # 被修改的已有节点 -> 规划前的 links 和 resourceVersion，用于 PATCH 的前置条件和回滚
+        self.original_links = {}
+        self.resource_versions = {}
+        # 新节点，doc 与 graph 中的是同一个对象，后续操作追加的 link 会直接出现在创建请求里
+        self.created = {}
+        self.pod_yamls = {}
+        # 新节点就绪后要在对端执行的接口配置：(类型, pod, 接口)
+        self.port_steps = []
+        self.deleted = []
+        # 删除节点时要在对端清理的接口：(pod, 接口)
+        self.cleanup_steps = []
+
+    def touch(self, name: str):
+        if name in self.created or name in self.original_links:
+            return
+        doc = self.graph.doc(name)
+        self.original_links[name] = copy.deepcopy(doc['spec'].get('links', []))
+        self.resource_versions[name] = doc['metadata'].get('resourceVersion')
+
+    def patched(self) -> list:
+        """
+        需要 PATCH 的已有节点，被删除的节点不再 PATCH
+        """
+        return [name for name in self.original_links if name not in self.deleted]
+
+
+def plan_batch(topology_docs: dict, operations: list) -> TopologyBatchPlan:
+    """
+    在一个快照上依次规划所有操作，后面的操作可以引用前面新增的节点
+    :param topology_docs: load_topology_yaml 返回的快照，会被修改
+    :param operations: 操作列表
+    :return: TopologyBatchPlan
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchPlanError("operations must be a non-empty list")
+
+    plan = TopologyBatchPlan(TopologyGraph(topology_docs))
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise BatchPlanError(f"operation {index} must be an object")
+        op = operation.get("op")
+        if op == "add":
+            plan_add(plan, index, operation)
+        elif op == "delete":
+            plan_delete(plan, index, operation)
+        else:
+            raise BatchPlanError(f"operation {index}: op {op} is not supported")
+    return plan
+
+
+def plan_add(plan: TopologyBatchPlan, index: int, operation: dict):
+    graph = plan.graph
+    kind = operation.get("kind")
+    peer = operation.get("peer")
+    if not peer or not graph.has_node(peer):
+        raise BatchPlanError(f"operation {index}: peer {peer} does not exist")
+    peer_kind = node_kind_of(peer)
+    if (kind, peer_kind) not in SUPPORTED_ADDS:
+        raise BatchPlanError(f"operation {index}: cannot add {kind} to {peer_kind} {peer}")
+
+    name = operation.get("name") or graph.next_pod_name(kind)
+    if graph.has_node(name) or name in graph.removed:
+        raise BatchPlanError(f"operation {index}: node {name} already exists")
+    if node_kind_of(name) != kind:
+        raise BatchPlanError(f"operation {index}: name {name} does not match kind {kind}")
+
+    uid = graph.next_uid()
+    peer_link = {
+        'uid': uid,
+        'peer_pod': name,
+        'local_intf': f"{peer}_{name}",
+        'peer_intf': f"{name}_{peer}",
+    }
+    new_link = {
+        'uid': uid,
+        'peer_pod': peer,
+        'local_intf': f"{name}_{peer}",
+        'peer_intf': f"{peer}_{name}",
+    }
+
+    if kind == "host":
+        default_route = graph.find_router_ip(peer)
+        if not default_route:
+            raise BatchPlanError(f"operation {index}: could not find a router connected to switch {peer}")
+        subnet = '.'.join(default_route.split('.')[:3])
+        host_ip = f"{subnet}.{graph.next_host_number(subnet)}/24"
+        peer_link['peer_ip'] = host_ip
+        new_link['local_ip'] = host_ip
+        pod_yaml = generate_host_pod_yaml(hostname=name, default_route=default_route)
+    elif kind == "router":
+        subnet_prefix = f"10.12.{graph.next_subnet_id()}"
+        peer_link['local_ip'] = new_link['peer_ip'] = f"{subnet_prefix}.1/24"
+        peer_link['peer_ip'] = new_link['local_ip'] = f"{subnet_prefix}.2/24"
+        pod_yaml = generate_router_pod_yaml(routername=name)
+    elif peer_kind == "router":
+        # 交换机或防火墙连接路由器：新建一个子网，路由器一端为 .1
+        r_ip = f"10.12.{graph.next_subnet_id()}.1/24"
+        peer_link['local_ip'] = new_link['peer_ip'] = r_ip
+        if kind == "switch":
+            pod_yaml = generate_switch_pod_yaml(swname=name, peerpodname=peer)
+        else:
+            pod_yaml = generate_firewall_pod_yaml(fwname=name, peerpodname=peer)
+    else:
+        pod_yaml = generate_switch_pod_yaml(swname=name, peerpodname=peer)
+
+    if peer_kind == "switch":
+        plan.port_steps.append(("switch", peer, peer_link['local_intf']))
+    elif peer_kind == "firewall":
+        plan.port_steps.append(("firewall", peer, peer_link['local_intf']))
+
+    plan.touch(peer)
+    new_doc = {
+        'apiVersion': 'networkop.co.uk/v1beta1',
+        'kind': 'Topology',
+        'metadata': {
+            'name': name
+        },
+        'spec': {
+            'links': [new_link]
+        }
+    }
+    graph.add_node(new_doc)
+    graph.add_link(peer, peer_link)
+    plan.created[name] = new_doc
+    plan.pod_yamls[name] = pod_yaml
+
+
+def plan_delete(plan: TopologyBatchPlan, index: int, operation: dict):
+    graph = plan.graph
+    name = operation.get("name")
+    if not name or not graph.has_node(name):
+        raise BatchPlanError(f"operation {index}: node {name} does not exist")
+    if name in plan.created:
+        raise BatchPlanError(f"operation {index}: cannot delete {name}, it is added in the same batch")
+    peers = graph.neighbors(name)
+    added_peers = [peer for peer in peers if peer in plan.created]
+    if added_peers:
+        raise BatchPlanError(f"operation {index}: cannot delete {name}, "
+                             f"{', '.join(added_peers)} is added to it in the same batch")
+
+    for peer in peers:
+        if not graph.has_node(peer):
+            continue
+        plan.touch(peer)
+        for link in graph.remove_link(peer, name):
+            plan.cleanup_steps.append((peer, link['local_intf']))
+    graph.remove_node(name)
+    plan.deleted.append(name)
+    # 先删除的节点是后删除节点的对端时，不必再清理它上面的接口
+    plan.cleanup_steps = [(pod, intf) for pod, intf in plan.cleanup_steps if pod not in plan.deleted]
+
+
+def run_parallel(func, items: list) -> list:
+    """
+    并行执行 func(item)，返回与 items 对应的结果，第一个异常在全部执行完之后抛出
+    """
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(items), TOPOLOGY_BATCH_CONCURRENCY),
+                            thread_name_prefix="topology-batch") as executor:
+        futures = [executor.submit(func, item) for item in items]
+    return [future.result() for future in futures]
+
+
+def run_port_steps(namespace: str, steps: list):
+    """
+    同一个 pod 上的接口配置按顺序执行，不同 pod 之间并行
+    """
+    by_pod = {}
+    for kind, pod, interface in steps:
+        by_pod.setdefault(pod, []).append((kind, interface))
+
+    def configure(pod):
+        for kind, interface in by_pod[pod]:
+            if kind == "switch":
+                add_peer_switch_ovs_br0_interface(switch_pod=pod, namespace=namespace, switch_interface=interface)
+            elif not add_peer_firewall_br0_interface(firewall_pod=pod, namespace=namespace, interface=interface):
+                raise RuntimeError(f"Failed to add interface {interface} to br0 of {pod}")
+
+    run_parallel(configure, list(by_pod))
+
+
+def rollback(namespace: str, plan: TopologyBatchPlan, applied: dict):
+    """
+    尽量撤销已经做出的修改，单步失败只记录日志
+    """
+    for kind, pod, interface in applied["ports"]:
+        if kind == "switch":
+            delete_peer_switch_ovs_br0_interface(switch_pod=pod, namespace=namespace, switch_interface=interface)
+        else:
+            delete_peer_host_or_firewall_or_router_interface(pod=pod, namespace=namespace, interface=interface)
+    for name in applied["pods"]:
+        delete_pod(namespace=namespace, pod_name=name)
+    for name in applied["created"]:
+        try:
+            delete_topology_item(namespace=namespace, name=name)
+        except Exception as e:
+            logger.warning(f"rollback: delete topology {name} failed: {e}")
+    for name in applied["patched"]:
+        try:
+            update_topology_item_link(namespace=namespace, topology={"spec": {"links": plan.original_links[name]}},
+                                      name=name)
+        except Exception as e:
+            logger.warning(f"rollback: restore links of {name} failed: {e}")
+
+
+def execute_plan(namespace: str, plan: TopologyBatchPlan) -> dict:
+    applied = {"created": [], "patched": [], "pods": [], "ports": []}
+    try:
+        # 先 PATCH 已有节点，拓扑在规划之后被修改过时在创建任何东西之前就能发现
+        for name in plan.patched():
+            update_topology_item_link(namespace=namespace, topology=plan.graph.doc(name), name=name,
+                                      resource_version=plan.resource_versions[name])
+            applied["patched"].append(name)
+        for name, doc in plan.created.items():
+            add_topology_item(namespace=namespace, topology_item_doc=doc)
+            applied["created"].append(name)
+
+        def create_pod(name):
+            add_pod(namespace=namespace, pod_name=name, pod_yaml=plan.pod_yamls[name])
+            applied["pods"].append(name)
+
+        run_parallel(create_pod, list(plan.created))
+        running = wait_pods_running(namespace=namespace, pod_names=list(plan.created)) if plan.created else {}
+        not_running = [name for name, ok in running.items() if not ok]
+        if not_running:
+            raise RuntimeError(f"Pod {', '.join(not_running)} did not become ready")
+
+        run_port_steps(namespace, plan.port_steps)
+        applied["ports"].extend(plan.port_steps)
+    except Exception as e:
+        logger.warning(f"topology batch in {namespace} failed, rolling back: {e}")
+        rollback(namespace, plan, applied)
+        if isinstance(e, ApiException) and e.status == 409:
+            raise BatchConflictError(f"topology in {namespace} changed during the batch, please retry") from e
+        raise
+
+    # 删除在新节点就绪之后执行，失败时不回滚，只在结果中报告
+    failed_deletes = []
+    for name in plan.deleted:
+        try:
+            delete_topology_item(namespace=namespace, name=name)
+        except ApiException as e:
+            if e.status != 404:
+                logger.warning(f"delete topology {name} failed: {e}")
+                failed_deletes.append(name)
+                continue
+        if not delete_pod(namespace=namespace, pod_name=name):
+            failed_deletes.append(name)
+    for pod, interface in plan.cleanup_steps:
+        if pod.startswith("sw"):
+            delete_peer_switch_ovs_br0_interface(switch_pod=pod, namespace=namespace, switch_interface=interface)
+        else:
+            delete_peer_host_or_firewall_or_router_interface(pod=pod, namespace=namespace, interface=interface)
+
+    return {
+        "created": list(plan.created),
+        "patched": plan.patched(),
+        "deleted": [name for name in plan.deleted if name not in failed_deletes],
+        "failed_deletes": failed_deletes,
+    }
+
+
+@timed("topology.batch")
+def execute_batch(namespace: str, operations: list) -> dict:
+    """
+    规划并执行一批拓扑修改
+    :param namespace: 虚拟网络所在的 namespace
+    :param operations: 操作列表，格式见模块说明
+    :return: {"created": [...], "patched": [...], "deleted": [...], "failed_deletes": [...]}
+    :raise BatchPlanError: 操作不合法，集群没有被修改
+    :raise BatchConflictError: 执行期间拓扑被其他请求修改，已回滚
+    """
+    plan = plan_batch(load_topology_yaml(namespace=namespace), operations)
+    logger.info(f"topology batch in {namespace}: create {list(plan.created)}, patch {plan.patched()}, "
+                f"delete {plan.deleted}")
+    return execute_plan(namespace, plan)
@@ -0,0 +1,256 @@
+"""
+    Topology CRD 的进程内缓存（informer）：每个 namespace 先 LIST 一次，之后通过 watch 增量更新
+    本服务自己的修改（patch / create / delete）会立即写入缓存，之后的读取一定能看到这些修改
+"""
+import copy
+import threading
+import time
+
+from kubernetes import watch
+from kubernetes.client import ApiException
+from loguru import logger
+
+from config.config import custom_object_dict, TOPOLOGY_WATCH_TIMEOUT_SECONDS, TOPOLOGY_CACHE_IDLE_SECONDS
+
+TOPOLOGY_GROUP = custom_object_dict["Topology"]["group"]
+TOPOLOGY_VERSION = custom_object_dict["Topology"]["version"]
+TOPOLOGY_PLURAL = custom_object_dict["Topology"]["plural"]
+
+
+def resource_version_of(obj: dict):
+    return (obj or {}).get("metadata", {}).get("resourceVersion")
+
+
+def is_newer(version, than, strict: bool = False) -> bool:
+    """
+    resourceVersion 在 k8s 中应当视为不透明的字符串，etcd 实现下是递增的整数，能转换成整数时才比较大小
+    :param strict: 为 True 时相等不算更新
+    """
+    if version is None or than is None:
+        return True
+    try:
+        return int(version) > int(than) if strict else int(version) >= int(than)
+    except (TypeError, ValueError):
+        return True
+
+
+class TopologyInformer:
+    """
+    一个 namespace 下所有 Topology 对象的缓存
+    """
+
+    def __init__(self, custom_api, namespace: str):
+        self.custom_api = custom_api
+        self.namespace = namespace
+        self.items = {}
+        # 本服务删除的对象及删除时的 resourceVersion，避免删除之前的事件晚到时把对象加回来
+        self.tombstones = {}
+        self.resource_version = None
+        self.lock = threading.Lock()
+        self.last_access = time.time()
+        self.thread = None
+        self.stopped = False
+
+    def relist(self):
+        resp = self.custom_api.list_namespaced_custom_object(
+            group=TOPOLOGY_GROUP,
+            version=TOPOLOGY_VERSION,
+            namespace=self.namespace,
+            plural=TOPOLOGY_PLURAL,
+        )
+        list_version = resource_version_of(resp)
+        listed = {item["metadata"]["name"]: item for item in resp["items"]}
+        # LIST 返回之后、拿到锁之前可能有 record_write / record_delete，逐个对象按 resourceVersion 合并
+        with self.lock:
+            items = {}
+            tombstones = {}
+            for name, item in listed.items():
+                # 删除时缓存中还没有该对象（informer 正在启动）时 tombstone 为 None，LIST 中的该对象一律视为旧数据
+                if name in self.tombstones and (self.tombstones[name] is None or not is_newer(
+                        resource_version_of(item), self.tombstones[name], strict=True)):
+                    tombstones[name] = self.tombstones[name]
+                    continue
+                current = self.items.get(name)
+                if current is not None and not is_newer(resource_version_of(item), resource_version_of(current)):
+                    items[name] = current
+                else:
+                    items[name] = item
+            for name, current in self.items.items():
+                if name not in listed and is_newer(resource_version_of(current), list_version, strict=True):
+                    items[name] = current
+            for name, version in self.tombstones.items():
+                if is_newer(version, list_version, strict=True):
+                    tombstones[name] = version
+            self.items = items
+            self.tombstones = tombstones
+            self.resource_version = list_version
+        logger.info(f"topology cache listed {len(resp['items'])} items in {self.namespace}, "
+                    f"resourceVersion {self.resource_version}")
+
+    def start(self):
+        """
+        同步完成第一次 LIST，然后在后台线程中 watch
+        """
+        self.relist()
+        self.thread = threading.Thread(target=self.run, name=f"topology-watch-{self.namespace}", daemon=True)
+        self.thread.start()
+
+    def alive(self) -> bool:
+        return self.thread is not None and self.thread.is_alive() and not self.stopped
+
+    def run(self):
+        while not self.stopped:
+            # 长时间没有读取时停止 watch，下次读取时重新 LIST
+            if time.time() - self.last_access > TOPOLOGY_CACHE_IDLE_SECONDS:
+                logger.info(f"topology cache for {self.namespace} is idle, stop watching")
+                self.stopped = True
+                return
+            try:
+                self.watch_once()
+            except ApiException as e:
+                if e.status == 410:
+                    logger.info(f"topology watch in {self.namespace} expired, relist")
+                else:
+                    logger.warning(f"topology watch in {self.namespace} failed: {e}")
+                    time.sleep(1)
+                self.relist_quietly()
+            except Exception as e:
+                logger.warning(f"topology watch in {self.namespace} failed: {e}")
+                time.sleep(1)
+                self.relist_quietly()
+
+    def relist_quietly(self):
+        try:
+            self.relist()
+        except Exception as e:
+            logger.warning(f"topology relist in {self.namespace} failed: {e}")
+            time.sleep(5)
+
+    def watch_once(self):
+        w = watch.Watch()
+        for event in w.stream(self.custom_api.list_namespaced_custom_object,
+                              group=TOPOLOGY_GROUP,
+                              version=TOPOLOGY_VERSION,
+                              namespace=self.namespace,
+                              plural=TOPOLOGY_PLURAL,
+                              resource_version=self.resource_version,
+                              allow_watch_bookmarks=True,
+                              timeout_seconds=TOPOLOGY_WATCH_TIMEOUT_SECONDS):
+            if self.stopped:
+                w.stop()
+                return
+            self.apply(event["type"], event["object"])
+
+    def apply(self, event_type: str, obj: dict):
+        if event_type == "ERROR":
+            raise ApiException(status=obj.get("code", 500), reason=obj.get("message"))
+        version = resource_version_of(obj)
+        with self.lock:
+            if event_type != "BOOKMARK":
+                name = obj["metadata"]["name"]
+                if event_type == "DELETED":
+                    self.items.pop(name, None)
+                    self.tombstones.pop(name, None)
+                elif name in self.tombstones and not is_newer(version, self.tombstones[name], strict=True):
+                    pass
+                elif is_newer(version, resource_version_of(self.items.get(name))):
+                    self.items[name] = obj
+                    self.tombstones.pop(name, None)
+            if version is not None:
+                self.resource_version = version
+
+    def record_write(self, obj: dict):
+        if not obj or "metadata" not in obj:
+            return
+        name = obj["metadata"]["name"]
+        with self.lock:
+            if is_newer(resource_version_of(obj), resource_version_of(self.items.get(name))):
+                self.items[name] = copy.deepcopy(obj)
+                self.tombstones.pop(name, None)
+
+    def record_delete(self, name: str):
+        with self.lock:
+            removed = self.items.pop(name, None)
+            self.tombstones[name] = resource_version_of(removed)
+
+    def snapshot(self) -> dict:
+        """
+        与 list_namespaced_custom_object 返回值格式相同的深拷贝，调用方可以直接修改
+        """
+        with self.lock:
+            self.last_access = time.time()
+            items = list(self.items.values())
+            version = self.resource_version
+        return {"items": copy.deepcopy(items), "metadata": {"resourceVersion": version}}
+
+    def get(self, name: str):
+        with self.lock:
+            self.last_access = time.time()
+            item = self.items.get(name)
+        return copy.deepcopy(item) if item is not None else None
+
+
+class TopologyCache:
+    """
+    按 namespace 懒加载 TopologyInformer，第一次读取某个 namespace 时 LIST 并开始 watch
+    """
+
+    def __init__(self, custom_api):
+        self.custom_api = custom_api
+        self.informers = {}
+        # 正在第一次 LIST 的 informer，期间的 record_write / record_delete 也写到这里，LIST 之后合并
+        self.starting = {}
+        # 每个 namespace 一把锁，保证同时只有一个线程在启动该 namespace 的 informer
+        self.start_locks = {}
+        self.lock = threading.Lock()
+
+    def informer(self, namespace: str) -> TopologyInformer:
+        """
+        第一次 LIST 在全局锁之外执行，一个 namespace 的 apiserver 请求慢时不会阻塞其他 namespace
+        """
+        with self.lock:
+            informer = self.informers.get(namespace)
+            if informer is not None and informer.alive():
+                return informer
+            start_lock = self.start_locks.setdefault(namespace, threading.Lock())
+
+        with start_lock:
+            with self.lock:
+                informer = self.informers.get(namespace)
+                if informer is not None and informer.alive():
+                    return informer
+                informer = TopologyInformer(self.custom_api, namespace)
+                self.starting[namespace] = informer
+            try:
+                informer.start()
+            finally:
+                with self.lock:
+                    self.starting.pop(namespace, None)
+            with self.lock:
+                self.informers[namespace] = informer
+            return informer
+
+    def active_informers(self, namespace: str) -> list:
+        with self.lock:
+            return [informer for informer in (self.informers.get(namespace), self.starting.get(namespace))
+                    if informer is not None]
+
+    def snapshot(self, namespace: str) -> dict:
+        return self.informer(namespace).snapshot()
+
+    def get(self, namespace: str, name: str):
+        """
+        :return: Topology 对象的深拷贝，不存在时返回 None
+        """
+        return self.informer(namespace).get(name)
+
+    def record_write(self, namespace: str, obj: dict):
+        """
+        本服务 patch / create 之后调用，参数为 apiserver 返回的对象
+        """
+        for informer in self.active_informers(namespace):
+            informer.record_write(obj)
+
+    def record_delete(self, namespace: str, name: str):
+        for informer in self.active_informers(namespace):
+            informer.record_delete(name)
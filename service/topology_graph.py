@@ -0,0 +1,167 @@
+"""
+    Topology 快照的索引：一次遍历建立名称、uid、子网号、子网内主机号和邻接表，
+    之后的查找和分配不再逐个扫描 topology_docs["items"]
+"""
+from collections import deque
+
+# get_next_avaliable_pod_name 中 node_kind 对应的名称前缀
+NODE_NAME_PREFIX = {
+    "host": "host",
+    "switch": "sw",
+    "firewall": "fw",
+    "router": "r",
+}
+
+
+def split_ip(ip: str):
+    """
+    :param ip: 如 10.12.3.5/24
+    :return: (子网前缀 "10.12.3", 子网号 3, 主机号 5)，格式不对时返回 None
+    """
+    parts = (ip or "").split('/')[0].split('.')
+    if len(parts) != 4:
+        return None
+    try:
+        return '.'.join(parts[:3]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+
+def smallest_unused(used, start: int = 1) -> int:
+    value = start
+    while value in used:
+        value += 1
+    return value
+
+
+class TopologyGraph:
+    """
+    由 load_topology_yaml 返回的快照构建，持有快照中 doc 的引用
+    通过 add_node / add_link / remove_link / remove_node 修改时索引同步更新，直接修改 doc 后需要重新构建
+    """
+
+    def __init__(self, topology_docs: dict):
+        self.docs = {}
+        self.uids = set()
+        self.subnet_ids = set()
+        self.hosts_by_subnet = {}
+        # name -> [(peer_pod, link), ...]，保持 links 中的顺序
+        self.adjacency = {}
+        # 已删除节点的名称，同一个快照上规划时不再分配，避免与还没删除完的 pod 重名
+        self.removed = set()
+
+        for doc in topology_docs["items"]:
+            if doc['kind'] != 'Topology':
+                for link in doc['spec'].get('links', []):
+                    self.uids.add(link['uid'])
+                continue
+            self.add_node(doc)
+
+    def add_node(self, doc: dict):
+        """
+        加入一个 Topology 对象并索引它已有的 links
+        """
+        name = doc['metadata']['name']
+        self.docs[name] = doc
+        self.adjacency[name] = []
+        for link in doc['spec'].get('links', []):
+            self.index_link(name, link)
+
+    def add_link(self, name: str, link: dict):
+        """
+        向节点追加一条 link，同时修改节点的 doc
+        """
+        self.docs[name]['spec'].setdefault('links', []).append(link)
+        self.index_link(name, link)
+
+    def remove_link(self, name: str, peer: str) -> list:
+        """
+        删除节点上所有指向 peer 的 link，已分配的 uid 和 ip 仍然保留
+        :return: 被删除的 link
+        """
+        links = self.docs[name]['spec'].get('links', [])
+        removed = [link for link in links if link['peer_pod'] == peer]
+        self.docs[name]['spec']['links'] = [link for link in links if link['peer_pod'] != peer]
+        self.adjacency[name] = [(p, link) for p, link in self.adjacency[name] if p != peer]
+        return removed
+
+    def remove_node(self, name: str):
+        self.docs.pop(name, None)
+        self.adjacency.pop(name, None)
+        self.removed.add(name)
+
+    def index_link(self, name: str, link: dict):
+        self.uids.add(link['uid'])
+        self.adjacency[name].append((link['peer_pod'], link))
+        # 只有路由器和交换机上的 ip 参与子网号分配，与原来的 get_next_avaliable_subnet_id 一致
+        counts_subnet = name.startswith('r') or name.startswith('sw')
+        for key in ('local_ip', 'peer_ip'):
+            parsed = split_ip(link.get(key))
+            if parsed is None:
+                continue
+            prefix, subnet_id, host_number = parsed
+            self.hosts_by_subnet.setdefault(prefix, set()).add(host_number)
+            if counts_subnet:
+                self.subnet_ids.add(subnet_id)
+
+    def has_node(self, name: str) -> bool:
+        return name in self.docs
+
+    def doc(self, name: str):
+        """
+        :return: 名称对应的 Topology 对象，不存在时返回 None
+        """
+        return self.docs.get(name)
+
+    def neighbors(self, name: str) -> list:
+        return [peer for peer, _ in self.adjacency.get(name, [])]
+
+    def next_pod_name(self, node_kind: str) -> str:
+        prefix = NODE_NAME_PREFIX.get(node_kind, "")
+        used = set()
+        for name in list(self.docs) + list(self.removed):
+            if name.startswith(prefix):
+                try:
+                    used.add(int(name[len(prefix):]))
+                except ValueError:
+                    continue
+        return prefix + str(smallest_unused(used))
+
+    def next_uid(self) -> int:
+        return smallest_unused(self.uids)
+
+    def next_subnet_id(self) -> int:
+        return smallest_unused(self.subnet_ids)
+
+    def find_router_ip(self, start_switch: str):
+        """
+        从交换机出发广度优先搜索，遇到的第一个路由器上指向已访问节点的接口 ip 即为默认路由
+        :return: 不带掩码的 ip，找不到时返回 None
+        """
+        visited = set()
+        queue = deque([start_switch])
+        while queue:
+            current = queue.popleft()
+            if current in visited:
+                continue
+            visited.add(current)
+            if current not in self.docs:
+                continue
+
+            if current.startswith('r'):
+                for peer, link in self.adjacency[current]:
+                    if 'local_ip' in link and peer in visited:
+                        return link['local_ip'].split('/')[0]
+                return None
+
+            for peer, _ in self.adjacency[current]:
+                if peer not in visited:
+                    queue.append(peer)
+        return None
+
+    def next_host_number(self, target_subnet: str) -> int:
+        """
+        :param target_subnet: 子网前缀，如 10.12.3
+        :return: 该子网内最小的未使用主机号
+        """
+        return smallest_unused(self.hosts_by_subnet.get(target_subnet, ()))
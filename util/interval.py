@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def merge_intervals(spans) -> (np.ndarray, np.ndarray):
+    """
+    将闭区间按起点排序并合并重叠（或首尾相接）的区间
+    例如 [(5, 8), (1, 3), (2, 4)] -> starts=[1, 5], ends=[4, 8]
+    :param spans: [(start, end), ...]
+    :return: (starts, ends)，两个升序数组，区间之间互不重叠
+    """
+    spans = np.asarray(spans, dtype="float64").reshape(-1, 2)
+    if len(spans) == 0:
+        return np.empty(0, dtype="float64"), np.empty(0, dtype="float64")
+
+    spans = spans[np.argsort(spans[:, 0], kind="stable")]
+    starts = spans[:, 0]
+    # 截至每个区间为止出现过的最大终点，某个区间的起点大于之前的最大终点时，它就是一个新的合并区间的起点
+    reach = np.maximum.accumulate(spans[:, 1])
+    is_head = np.empty(len(spans), dtype=bool)
+    is_head[0] = True
+    is_head[1:] = starts[1:] > reach[:-1]
+
+    heads = np.flatnonzero(is_head)
+    tails = np.append(heads[1:], len(spans)) - 1
+    return starts[heads], reach[tails]
+
+
+def label_in_intervals(timestamps, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    判断每个时间点是否落在某个闭区间 [start, end] 内，区间需先经过 merge_intervals 合并
+    每个时间点二分查找起点不大于它的最后一个区间，复杂度 O(n log m)
+    :param timestamps: 时间点数组
+    :param starts: merge_intervals 返回的起点
+    :param ends: merge_intervals 返回的终点
+    :return: int8 数组，1 表示在区间内，0 表示不在
+    """
+    timestamps = np.asarray(timestamps, dtype="float64")
+    if len(starts) == 0:
+        return np.zeros(len(timestamps), dtype="int8")
+
+    pos = np.searchsorted(starts, timestamps, side="right") - 1
+    inside = (pos >= 0) & (timestamps <= ends[np.maximum(pos, 0)])
+    return inside.astype("int8")
@@ -0,0 +1,74 @@
+import threading
+import time
+from functools import wraps
+
+# 直方图桶的上界（秒），最后一个桶收集超过 300 秒的耗时
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class LatencyHistogram:
+    """
+    按操作名统计耗时分布，线程安全
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def observe(self, operation: str, seconds: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        with self.lock:
+            stat = self.stats.setdefault(operation, {
+                "count": 0, "sum": 0.0, "max": 0.0, "counts": [0] * (len(self.buckets) + 1)})
+            stat["count"] += 1
+            stat["sum"] += seconds
+            stat["max"] = max(stat["max"], seconds)
+            stat["counts"][index] += 1
+
+    def snapshot(self) -> dict:
+        """
+        :return: 操作名 -> {count, sum, mean, max, buckets: {"le_<上界>": 落在该桶的次数, "inf": ...}}
+        """
+        with self.lock:
+            stats = {operation: dict(stat, counts=list(stat["counts"])) for operation, stat in self.stats.items()}
+        result = {}
+        for operation, stat in stats.items():
+            labels = ["le_{}".format(bound) for bound in self.buckets] + ["inf"]
+            result[operation] = {
+                "count": stat["count"],
+                "sum": round(stat["sum"], 3),
+                "mean": round(stat["sum"] / stat["count"], 3),
+                "max": round(stat["max"], 3),
+                "buckets": dict(zip(labels, stat["counts"])),
+            }
+        return result
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+
+# 全局的操作耗时统计，拓扑操作和各种等待都记录在这里
+latency = LatencyHistogram()
+
+
+def timed(operation: str):
+    """
+    装饰器：把函数的耗时（包括抛出异常的情况）记录到 latency 中
+    :param operation: 操作名
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            begin = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                latency.observe(operation, time.perf_counter() - begin)
+        return wrapper
+    return decorator
@@ -0,0 +1,19 @@
+import numpy as np
+
+
+def find_runs(values, target=1) -> np.ndarray:
+    """
+    run-length 编码，找出序列中连续等于 target 的片段
+    例如 [0, 1, 1, 0, 1] -> [[1, 3], [4, 5]]
+    :param values: 一维序列，例如预测结果或者真实标签
+    :param target: 需要查找的值
+    :return: shape 为 (n, 2) 的数组，每一行是一个片段的 [起始下标, 结束下标)，结束下标不包含在片段内
+    """
+    mask = np.asarray(values) == target
+    if mask.size == 0:
+        return np.empty((0, 2), dtype="int64")
+    # 在两端补 False，片段的起点和终点就是相邻元素发生变化的位置
+    edges = np.diff(np.concatenate(([False], mask, [False])).astype("int8"))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return np.column_stack((starts, ends))
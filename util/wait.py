@@ -0,0 +1,32 @@
+import time
+
+from util.latency import latency
+
+
+def wait_for(condition, timeout: float, initial_interval: float = 0.1, max_interval: float = 2.0,
+             factor: float = 2.0, name: str = None):
+    """
+    以指数退避反复检查 condition，直到返回真值或超时，替代固定时长的 sleep
+    例如 initial_interval=0.1 时依次间隔 0.1、0.2、0.4 ... 秒，最长 max_interval 秒
+    :param condition: 无参数的函数，返回真值表示条件满足；需要自己处理异常
+    :param timeout: 最长等待时间（秒）
+    :param initial_interval: 第一次重试前的间隔
+    :param max_interval: 重试间隔的上限
+    :param factor: 每次重试间隔的增长倍数
+    :param name: 给定时把等待耗时记录到 latency 的 "wait.<name>" 中
+    :return: condition 最后一次的返回值，超时时为假值
+    """
+    begin = time.perf_counter()
+    deadline = begin + timeout
+    interval = initial_interval
+    try:
+        while True:
+            result = condition()
+            remaining = deadline - time.perf_counter()
+            if result or remaining <= 0:
+                return result
+            time.sleep(min(interval, remaining))
+            interval = min(interval * factor, max_interval)
+    finally:
+        if name:
+            latency.observe("wait." + name, time.perf_counter() - begin)